@@ -0,0 +1,3 @@
+"""
+Catalogue helpers shared by the Streamlit pages (no Streamlit imports here).
+"""
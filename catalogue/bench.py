@@ -0,0 +1,334 @@
+"""
+catalogue/bench.py
+
+Micro-benchmarks for the Book Finder search path on a synthetic catalogue.
+
+    python -m catalogue.bench            # 100k rows
+    python -m catalogue.bench 20000      # custom size
+"""
+
+import pickle
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from catalogue.descriptions import DESCRIPTION_COLUMN, DescriptionStore, write_descriptions
+from catalogue.engine import CatalogueEngine, Query
+from catalogue.fulltext import FullTextIndex
+from catalogue.fuzzy import FuzzyIndex
+from catalogue.index import FACET_COLUMNS, CatalogueIndex
+from catalogue.planner import format_plan
+from catalogue.store import file_sha1, load_catalogue_frame, normalise_frame, read_csv_frame, write_columnar
+from ingest.tagger import TAG_COLUMNS, tag_frame
+
+
+VOCAB: Dict[str, List[str]] = {
+    "genres": [
+        "Contemporary", "Historical", "Fantasy", "Paranormal",
+        "Dark Romance", "Romantic Suspense", "Sci-Fi", "Sports Romance",
+    ],
+    "relationship": ["1-on-1", "Love Triangle", "Why Choose", "Polyamory"],
+    "tropes": [
+        "Enemies to Lovers", "Friends to Lovers", "Childhood Friends", "Fake Dating",
+        "Forced Proximity", "Marriage of Convenience", "Fated Mates", "Second Chance",
+        "Single Parent", "Forbidden Romance", "Grumpy / Sunshine", "Boss / Employee",
+        "Bodyguard", "Only One Bed", "Slow Burn",
+    ],
+    "content_warnings": [
+        "Violence", "Abuse", "Cheating", "Death", "Addiction",
+        "Dubious Consent", "Mental Health", "Self-Harm",
+    ],
+    "hero_traits": [
+        "Morally Grey", "Sunshine", "Grumpy", "Alpha", "Soft Dom",
+        "Cinnamon Roll", "Tattooed", "Biker", "Royalty", "Billionaire",
+    ],
+    "heroine_traits": [
+        "Sunshine", "Grumpy", "Strong-willed", "Reluctant",
+        "Morally Grey", "Bookworm", "STEM Girl", "Single Mom", "Princess",
+    ],
+}
+
+WORDS = (
+    "love heart duke kiss storm night crown rebel secret summer wolf shadow "
+    "promise wild fire dance bride lord hunter academy ocean rose thorn"
+).split()
+
+
+def synthetic_catalogue(n_rows: int = 100_000, seed: int = 7) -> pd.DataFrame:
+    """Random catalogue with the same columns as data/romance_catalogue.csv."""
+    rng = random.Random(seed)
+
+    def pipes(col: str, max_k: int) -> str:
+        return "|".join(rng.sample(VOCAB[col], rng.randint(0, max_k)))
+
+    rows = []
+    for i in range(n_rows):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+        in_series = rng.random() < 0.3
+        rows.append({
+            "id": i + 1,
+            "title": title,
+            "author": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}son",
+            "series_name": f"The {rng.choice(WORDS).title()} Saga" if in_series else "",
+            "series_order": rng.randint(1, 6) if in_series else "",
+            "year": rng.randint(1950, 2025),
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 80))),
+            "link": f"https://openlibrary.org/works/OL{i}W",
+            "cover_url": "",
+            "spice_level": rng.randint(1, 5),
+            "genres": pipes("genres", 2),
+            "relationship": pipes("relationship", 1),
+            "tropes": pipes("tropes", 4),
+            "content_warnings": pipes("content_warnings", 3),
+            "hero_traits": pipes("hero_traits", 3),
+            "heroine_traits": pipes("heroine_traits", 3),
+            "notes": "",
+        })
+    return pd.DataFrame(rows)
+
+
+# The pre-index Book Finder filters, kept here as the baseline.
+
+def legacy_include_any(df: pd.DataFrame, col: str, selected: list) -> pd.DataFrame:
+    if not selected or col not in df.columns:
+        return df
+    def row_ok(val: str) -> bool:
+        text = str(val).lower()
+        return any(s.lower() in text for s in selected)
+    return df[df[col].apply(row_ok)]
+
+
+def legacy_exclude_any(df: pd.DataFrame, col: str, selected: list) -> pd.DataFrame:
+    if not selected or col not in df.columns:
+        return df
+    def row_bad(val: str) -> bool:
+        text = str(val).lower()
+        return any(s.lower() in text for s in selected)
+    return df[~df[col].apply(row_bad)]
+
+
+SAMPLE_FILTERS = [
+    ("genres", ["Fantasy", "Paranormal"], ["Dark Romance"]),
+    ("relationship", [], ["Love Triangle"]),
+    ("tropes", ["Enemies to Lovers", "Grumpy"], ["Cheating"]),
+    ("content_warnings", [], ["Abuse", "Self-Harm"]),
+    ("hero_traits", ["Morally Grey"], []),
+    ("heroine_traits", [], ["Princess"]),
+]
+
+
+def timed(fn: Callable[[], object], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_filters(df: pd.DataFrame) -> None:
+    def legacy():
+        out = df
+        for col, inc, exc in SAMPLE_FILTERS:
+            out = legacy_include_any(out, col, inc)
+            out = legacy_exclude_any(out, col, exc)
+        return out
+
+    build_start = time.perf_counter()
+    index = CatalogueIndex(df)
+    build = time.perf_counter() - build_start
+
+    def indexed():
+        mask = index.all_rows()
+        for col, inc, exc in SAMPLE_FILTERS:
+            mask &= index.include_any(col, inc)
+            mask &= index.exclude_any(col, exc)
+        return df[mask]
+
+    assert legacy()["id"].tolist() == indexed()["id"].tolist()
+    print(f"index build:          {build * 1000:8.1f} ms (once per catalogue)")
+    print(f"filters, apply path:  {timed(legacy) * 1000:8.1f} ms")
+    print(f"filters, index path:  {timed(indexed) * 1000:8.1f} ms")
+
+    mask = index.include_any("tropes", ["Slow Burn"])
+    print(f"live facet counts:    {timed(lambda: index.facet_counts(mask), repeat=20) * 1000:8.2f} ms")
+
+
+def legacy_text_match(df: pd.DataFrame, q: str) -> pd.DataFrame:
+    q = q.lower()
+    mask = None
+    for c in ["title", "author", "tropes"]:
+        m = df[c].astype(str).str.lower().str.contains(q, na=False)
+        mask = m if mask is None else mask | m
+    return df[mask]
+
+
+SAMPLE_QUERIES = ["duke", "shadow crown", "oceanson", "enemies to lovers"]
+
+
+def bench_text(df: pd.DataFrame) -> None:
+    build_start = time.perf_counter()
+    index = FullTextIndex(df)
+    build = time.perf_counter() - build_start
+    print(f"full-text build:      {build * 1000:8.1f} ms (once per catalogue)")
+    for q in SAMPLE_QUERIES:
+        legacy = timed(lambda: legacy_text_match(df, q))
+        indexed = timed(lambda: index.search(q))
+        hits = len(index.search(q)[0])
+        print(f"query {q!r:22} str.contains {legacy * 1000:7.1f} ms | BM25 {indexed * 1000:6.2f} ms ({hits} hits)")
+
+
+def bench_fuzzy(df: pd.DataFrame) -> None:
+    build_start = time.perf_counter()
+    index = FuzzyIndex(df)
+    build = time.perf_counter() - build_start
+    print(f"fuzzy build:          {build * 1000:8.1f} ms ({len(index.keys)} names)")
+    typos = [df["title"].iloc[5][:-1], df["author"].iloc[9].replace("son", "sn"), "xyzzy"]
+    for q in typos:
+        t = timed(lambda: index.lookup(q), repeat=20)
+        best = index.lookup(q)
+        label = best[0].label if best else "-"
+        print(f"fuzzy {q!r:22} {t * 1000:6.2f} ms -> {label!r}")
+
+
+SAMPLE_QUERY = Query(
+    text="shadow",
+    spice_include=(3, 4, 5),
+    include={"tropes": ("Enemies to Lovers", "Grumpy"), "hero_traits": ("Morally Grey",)},
+    exclude={"content_warnings": ("Abuse", "Self-Harm"), "genres": ("Dark Romance",)},
+)
+
+
+def bench_engine(df: pd.DataFrame) -> None:
+    build_start = time.perf_counter()
+    engine = CatalogueEngine(df)
+    build = time.perf_counter() - build_start
+    result = engine.search(SAMPLE_QUERY)
+    print(f"engine build:         {build * 1000:8.1f} ms")
+    print(f"engine.search:        {timed(lambda: engine.search(SAMPLE_QUERY)) * 1000:8.2f} ms ({result.total} matches)")
+    print(format_plan(result.plan))
+
+    # A slice keeps every category of the facet columns; values no row uses
+    # must count 0 (and not shift the counts of the others)
+    part = normalise_frame(df.copy()).iloc[:3].reset_index(drop=True)
+    result = CatalogueEngine(part).search(Query(spice_include=(1, 2, 3, 4, 5)))
+    for col in FACET_COLUMNS:
+        cells = part[col].astype(str).iloc[result.row_ids]
+        expected = Counter(v for cell in cells for v in cell.split("|") if v)
+        assert result.facets[col] == expected, f"facet counts for {col} are off"
+
+
+def bench_load(df: pd.DataFrame) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "romance_catalogue.csv"
+        df.to_csv(csv_path, index=False)
+
+        def legacy_load():
+            out = pd.read_csv(csv_path)
+            for col in out.columns:
+                if out[col].dtype == object or pd.api.types.is_string_dtype(out[col]):
+                    out[col] = out[col].fillna("")
+            return out
+
+        legacy_time = timed(legacy_load)
+        legacy_mem = legacy_load().memory_usage(deep=True).sum()
+        csv_time = timed(lambda: read_csv_frame(csv_path))
+        csv_mem = read_csv_frame(csv_path).memory_usage(deep=True).sum()
+
+        if write_columnar(csv_path) is None:
+            return
+        columnar_time = timed(lambda: load_catalogue_frame(csv_path))
+        columnar_mem = load_catalogue_frame(csv_path).memory_usage(deep=True).sum()
+
+        # What CatalogueEngine.from_path reads: no description column, the
+        # store mapped (only its offsets are resident until rows are rendered)
+        write_descriptions(csv_path)
+
+        def lazy_load():
+            source_hash = file_sha1(csv_path)
+            store = DescriptionStore.open(csv_path, source_hash)
+            return load_catalogue_frame(csv_path, skip=(DESCRIPTION_COLUMN,), source_hash=source_hash), store
+
+        lazy_time = timed(lazy_load)
+        frame, store = lazy_load()
+        lazy_mem = frame.memory_usage(deep=True).sum() + store.offsets.nbytes
+
+    print(f"load, CSV (old path): {legacy_time * 1000:8.1f} ms  {legacy_mem / 1e6:7.1f} MB")
+    print(f"load, CSV:            {csv_time * 1000:8.1f} ms  {csv_mem / 1e6:7.1f} MB")
+    print(f"load, Parquet:        {columnar_time * 1000:8.1f} ms  {columnar_mem / 1e6:7.1f} MB")
+    print(f"load, Parquet + .desc:{lazy_time * 1000:8.1f} ms  {lazy_mem / 1e6:7.1f} MB "
+          f"(+{store.nbytes / 1e6:.1f} MB of descriptions mapped, not loaded)")
+
+
+def bench_tagger(df: pd.DataFrame) -> None:
+    untagged = df.copy()
+    for col in TAG_COLUMNS:
+        untagged[col] = ""
+    start = time.perf_counter()
+    filled = tag_frame(untagged)
+    elapsed = time.perf_counter() - start
+    chars = df["description"].str.len().sum()
+    print(f"tagger:               {elapsed * 1000:8.1f} ms ({len(df)} rows, {chars / 1e6:.1f}M description chars, "
+          f"{sum(filled.values())} cells filled)")
+
+
+SESSION_QUERIES = [
+    SAMPLE_QUERY,
+    Query(include={"tropes": ("Slow Burn",)}, spice_include=(4, 5)),
+    Query(text="duke"),
+    Query(text="enemies to lovers", exclude={"content_warnings": ("Cheating",)}),
+]
+
+
+def bench_sessions(df: pd.DataFrame, counts: tuple = (1, 10, 50), page_size: int = 24) -> None:
+    """
+    Memory held per Book Finder session: with the shared engine a session
+    keeps its query, result ids and one rendered page; the old
+    st.cache_data path unpickled (and then copied) the whole frame per rerun.
+    """
+    engine = CatalogueEngine(df)
+
+    def shared_session(i: int) -> Dict[str, object]:
+        query = SESSION_QUERIES[i % len(SESSION_QUERIES)]
+        result = engine.search(query)
+        return {"query": query, "result": result, "page": engine.rows(result.page(0, page_size))}
+
+    pickled = pickle.dumps(df)
+
+    def legacy_session(i: int) -> Dict[str, object]:
+        frame = pickle.loads(pickled)   # st.cache_data hands every rerun a fresh copy
+        return {"frame": frame, "filtered": frame.copy()}
+
+    tracemalloc.start()
+    for label, make, sizes in (("shared engine", shared_session, counts), ("cache_data", legacy_session, counts[:2])):
+        for n in sizes:
+            before = tracemalloc.get_traced_memory()[0]
+            sessions = [make(i) for i in range(n)]
+            held = tracemalloc.get_traced_memory()[0] - before
+            print(f"{label:<14} {n:3d} sessions: {held / 1e6:8.2f} MB held, {held / n / 1e3:9.1f} KB per session")
+            del sessions
+    tracemalloc.stop()
+
+
+def main(argv: List[str]) -> None:
+    n_rows = int(argv[0]) if argv else 100_000
+    print(f"Building synthetic catalogue with {n_rows} rows...")
+    df = synthetic_catalogue(n_rows)
+    bench_filters(df)
+    bench_text(df)
+    bench_fuzzy(df)
+    bench_engine(df)
+    bench_load(df)
+    bench_tagger(df)
+    bench_sessions(df)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,215 @@
+"""
+catalogue/covers.py
+
+Local thumbnail cache for Open Library cover images.
+
+The ingester downloads each cover once and stores a small thumbnail under
+assets/covers/, content-addressed by the thumbnail's SHA-256
+(assets/covers/ab/ab12….webp). manifest.json (committed with the
+thumbnails, written only by the ingester) maps the original cover URL to
+its thumbnail and when it was downloaded.
+
+Book Finder never rewrites the manifest: the times it shows a cover are
+kept in memory and now and then saved to usage.json, an untracked
+sidecar. Once the cache grows past MAX_CACHE_BYTES the ingester drops
+covers the catalogue no longer references, and when that isn't enough
+it stops downloading: the remaining books keep their remote URL rather
+than pushing out covers that would be fetched again next week. A trim
+without a catalogue (evict() with no `referenced`) goes least recently
+used first (shown, or else downloaded).
+
+Covers Open Library can't serve (404, not an image) are recorded in
+failed.json, committed next to the manifest, and not asked for again
+until RETRY_FAILED_AFTER has passed, so they can't use up every run's
+download budget.
+
+Book Finder asks CoverCache.src(url) for what to display: the local
+thumbnail when there is one, otherwise the remote URL. Its CoverCache
+lives as long as the process, so refresh() re-reads the manifest when
+the file changes (one stat per rerun), like LiveCatalogue does for the
+catalogue.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from catalogue.store import atomic_replace, file_version
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+COVER_DIR = BASE_DIR / "assets" / "covers"
+MANIFEST_NAME = "manifest.json"
+USAGE_NAME = "usage.json"        # Book Finder's last-used times; not committed
+FAILED_NAME = "failed.json"      # URL -> when to try a failed download again
+
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+THUMB_WIDTH = 220          # 2x the 110px Book Finder displays
+FLUSH_INTERVAL = 300       # seconds between best-effort usage.json writes
+RETRY_FAILED_AFTER = 14 * 24 * 3600
+
+
+class CoverCache:
+    def __init__(self, root: Path = COVER_DIR, max_bytes: int = MAX_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.manifest_path = root / MANIFEST_NAME
+        self.usage_path = root / USAGE_NAME
+        self.failed_path = root / FAILED_NAME
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = time.time()
+        self._manifest_key = _stat_key(self.manifest_path)
+        self.entries: Dict[str, Dict] = _read_json(self.manifest_path)
+        self.used: Dict[str, float] = _read_json(self.usage_path)
+        self.failed: Dict[str, int] = _read_json(self.failed_path)
+
+    def refresh(self) -> bool:
+        """Re-read the manifest if the ingester rewrote it; True when it changed."""
+        key = _stat_key(self.manifest_path)
+        if key == self._manifest_key:
+            return False
+        entries = _read_json(self.manifest_path)
+        with self._lock:
+            self.entries = entries
+            self._manifest_key = key
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.entries
+
+    def lookup(self, url: str) -> Optional[Path]:
+        """Local thumbnail for `url` (and mark it used), or None on a miss."""
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        path = self.root / entry["file"]
+        if not path.exists():
+            return None
+        with self._lock:
+            self.used[url] = time.time()
+            self._dirty = True
+        return path
+
+    def last_used(self, url: str) -> float:
+        return max(self.used.get(url, 0.0), self.entries[url]["last_used"])
+
+    def src(self, url: str) -> str:
+        """What to hand to st.image: the local thumbnail, else the remote URL."""
+        if not url:
+            return url
+        path = self.lookup(url)
+        return str(path) if path is not None else url
+
+    def add(self, url: str, data: bytes, ext: str) -> Path:
+        digest = hashlib.sha256(data).hexdigest()
+        rel = f"{digest[:2]}/{digest}.{ext}"
+        path = self.root / rel
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with atomic_replace(path) as tmp_path:
+                tmp_path.write_bytes(data)
+        with self._lock:
+            self.entries[url] = {"file": rel, "bytes": len(data), "last_used": time.time()}
+            self.failed.pop(url, None)
+            self._dirty = True
+        return path
+
+    def mark_failed(self, url: str, retry_after: float = RETRY_FAILED_AFTER) -> None:
+        with self._lock:
+            self.failed[url] = int(time.time() + retry_after)
+
+    def should_fetch(self, url: str) -> bool:
+        """Not cached, and not a recent failure."""
+        return url not in self.entries and self.failed.get(url, 0) <= time.time()
+
+    def forget_failures(self, referenced: Set[str]) -> int:
+        """Drop failure records of URLs the catalogue no longer has."""
+        with self._lock:
+            gone = [url for url in self.failed if url not in referenced]
+            for url in gone:
+                del self.failed[url]
+        return len(gone)
+
+    def total_bytes(self) -> int:
+        files = {e["file"]: e["bytes"] for e in self.entries.values()}
+        return sum(files.values())
+
+    def evict(self, referenced: Optional[Set[str]] = None) -> int:
+        """
+        Drop thumbnails until under max_bytes. With `referenced` (the current
+        catalogue) only URLs outside it go, so a cover is never deleted just
+        to be downloaded again; without it, least recently used first.
+        """
+        removed = 0
+        with self._lock:
+            sizes = {e["file"]: e["bytes"] for e in self.entries.values()}
+            total = sum(sizes.values())
+            refs: Dict[str, int] = {}
+            for e in self.entries.values():
+                refs[e["file"]] = refs.get(e["file"], 0) + 1
+
+            candidates = [u for u in self.entries if referenced is None or u not in referenced]
+            for url in sorted(candidates, key=self.last_used):
+                if total <= self.max_bytes:
+                    break
+                entry = self.entries.pop(url)
+                self.used.pop(url, None)
+                refs[entry["file"]] -= 1
+                if refs[entry["file"]] == 0:
+                    total -= sizes[entry["file"]]
+                    (self.root / entry["file"]).unlink(missing_ok=True)
+                removed += 1
+            if removed:
+                self._dirty = True
+        return removed
+
+    def save(self) -> None:
+        """Write the manifest and failures (ingester only) and the usage sidecar."""
+        with self._lock:
+            data = json.dumps(self.entries, indent=0, sort_keys=True)
+            failed = json.dumps(self.failed, indent=0, sort_keys=True)
+        _write_json(self.manifest_path, data)
+        _write_json(self.failed_path, failed)
+        self.save_usage()
+
+    def save_usage(self) -> None:
+        with self._lock:
+            data = json.dumps(self.used, indent=0, sort_keys=True)
+            self._dirty = False
+            self._last_flush = time.time()
+        _write_json(self.usage_path, data)
+
+    def flush(self, min_interval: float = FLUSH_INTERVAL) -> None:
+        """Persist last-used times to usage.json now and then; ignore read-only deployments."""
+        if not self._dirty or time.time() - self._last_flush < min_interval:
+            return
+        try:
+            self.save_usage()
+        except OSError:
+            pass
+
+
+def _stat_key(path: Path) -> Optional[str]:
+    try:
+        return file_version(path)
+    except OSError:
+        return None
+
+
+def _read_json(path: Path) -> Dict:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path: Path, data: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_replace(path) as tmp_path:
+        tmp_path.write_text(data, encoding="utf-8")
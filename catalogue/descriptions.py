@@ -0,0 +1,140 @@
+"""
+catalogue/descriptions.py
+
+Book descriptions, kept out of the in-memory search frame.
+
+`description` is by far the widest column of the catalogue, but Book
+Finder only shows a few hundred characters of it for the rows on screen.
+The ingester writes it to data/romance_catalogue.desc next to the CSV:
+
+    header   MAGIC, SHA-1 of the CSV it was built from, row count
+    offsets  (rows + 1) little-endian int64 byte offsets
+    blob     every description, UTF-8, back to back (row i = blob[off[i]:off[i+1]])
+
+DescriptionStore memory-maps that file, so only the offsets are touched
+at load time and a description is decoded when its row is rendered. Row
+ids are positions in the catalogue, the same ids the engine returns. Like
+the Parquet copy, a store built from an older CSV is ignored.
+"""
+
+import mmap
+import struct
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from catalogue.store import CSV_PATH, atomic_replace, file_sha1
+
+
+DESCRIPTION_COLUMN = "description"
+
+MAGIC = b"SZDESC1\n"
+HEADER = struct.Struct("<8s40sq")   # magic, source SHA-1 (hex), row count
+MAX_UTF8_BYTES = 4                  # per character, for max_chars slicing
+
+
+def descriptions_path_for(csv_path: Path) -> Path:
+    return csv_path.with_suffix(".desc")
+
+
+def read_descriptions(csv_path: Path) -> List[str]:
+    """Just the description column of the CSV (blank for missing cells)."""
+    df = pd.read_csv(csv_path, usecols=lambda c: c == DESCRIPTION_COLUMN, dtype=str)
+    if DESCRIPTION_COLUMN not in df.columns:
+        return [""] * len(df)
+    return df[DESCRIPTION_COLUMN].fillna("").tolist()
+
+
+def encode_descriptions(texts: Sequence[str]) -> Tuple[np.ndarray, bytes]:
+    encoded = [str(t).encode("utf-8") for t in texts]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype("<i8")
+    return offsets, b"".join(encoded)
+
+
+def write_descriptions(csv_path: Path = CSV_PATH) -> Path:
+    """(Re)build the description store of csv_path if it is missing or stale."""
+    path = descriptions_path_for(csv_path)
+    source_hash = file_sha1(csv_path)
+    if path.exists() and DescriptionStore.open(csv_path, source_hash) is not None:
+        print(f"{path.name} already up to date.")
+        return path
+
+    offsets, blob = encode_descriptions(read_descriptions(csv_path))
+    with atomic_replace(path) as tmp_path, tmp_path.open("wb") as f:
+        f.write(HEADER.pack(MAGIC, source_hash.encode(), len(offsets) - 1))
+        f.write(offsets.tobytes())
+        f.write(blob)
+    print(f"Wrote description store {path.name} ({len(offsets) - 1} rows, {len(blob) / 1e6:.1f} MB)")
+    return path
+
+
+class DescriptionStore:
+    """Read-only descriptions by row id; see the module docstring for the layout."""
+
+    def __init__(self, offsets: np.ndarray, blob, source_hash: str = ""):
+        # blob: bytes, or a view of the mapped file (unmapped once the store is dropped)
+        self.offsets = offsets
+        self.offsets.flags.writeable = False
+        self.blob = blob
+        self.source_hash = source_hash
+
+    @classmethod
+    def open(cls, csv_path: Path = CSV_PATH, source_hash: Optional[str] = None) -> Optional["DescriptionStore"]:
+        """The on-disk store for csv_path, or None if it is missing, corrupt or stale."""
+        path = descriptions_path_for(csv_path)
+        if not path.exists() or not csv_path.exists():
+            return None
+        with path.open("rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:   # empty file
+                return None
+        try:
+            magic, recorded, n_rows = HEADER.unpack_from(mapped, 0)
+            start = HEADER.size + (n_rows + 1) * 8
+            if magic != MAGIC or n_rows < 0 or start > len(mapped):
+                raise ValueError(f"{path.name} is not a description store")
+            if recorded.decode() != (source_hash or file_sha1(csv_path)):
+                raise ValueError(f"{path.name} was built from another CSV")
+            offsets = np.frombuffer(mapped, dtype="<i8", count=n_rows + 1, offset=HEADER.size)
+            if offsets[-1] != len(mapped) - start:
+                raise ValueError(f"{path.name} is truncated")
+        except (struct.error, ValueError, UnicodeDecodeError):
+            return None   # the map is released with the last reference to it
+        return cls(offsets, memoryview(mapped)[start:], recorded.decode())
+
+    @classmethod
+    def from_texts(cls, texts: Sequence[str]) -> "DescriptionStore":
+        """In-memory store (no .desc file yet); still keeps the text out of the frame."""
+        offsets, blob = encode_descriptions(texts)
+        return cls(offsets, blob)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets[-1].item()
+
+    def get(self, row_id: int, max_chars: Optional[int] = None) -> str:
+        """Description of one row; with max_chars only that prefix is decoded."""
+        start, end = self.offsets[row_id].item(), self.offsets[row_id + 1].item()
+        if max_chars is None:
+            return bytes(self.blob[start:end]).decode("utf-8")
+        end = min(end, start + max_chars * MAX_UTF8_BYTES)
+        # A cut through a multi-byte character is dropped, not an error
+        return bytes(self.blob[start:end]).decode("utf-8", errors="ignore")[:max_chars]
+
+    def many(self, row_ids: Sequence[int], max_chars: Optional[int] = None) -> List[str]:
+        return [self.get(int(i), max_chars) for i in row_ids]
+
+    def chunks(self, size: int = 50_000) -> Iterator[Tuple[int, List[str]]]:
+        """(first row id, descriptions) for consecutive blocks of rows, for index builds."""
+        for first in range(0, len(self), size):
+            last = min(first + size, len(self))
+            data = bytes(self.blob[self.offsets[first].item():self.offsets[last].item()])
+            local = self.offsets[first:last + 1] - self.offsets[first]
+            yield first, [data[a:b].decode("utf-8") for a, b in zip(local[:-1].tolist(), local[1:].tolist())]
@@ -0,0 +1,175 @@
+"""
+catalogue/engine.py
+
+Streamlit-free search engine over the Sizzl catalogue.
+
+A CatalogueEngine is built once per catalogue version. It owns the
+DataFrame and every precomputed structure (facet index, full-text index,
+fuzzy index, global facet counts). Descriptions are not in the frame:
+they live in a DescriptionStore (catalogue/descriptions.py) and rows()
+adds them for the rows being rendered. search(Query) is the single entry
+point used by Book Finder, the benchmarks and anything else that needs
+to query the catalogue; its filters run in the order chosen by the
+QueryPlanner (catalogue/planner.py), and the trace is kept on the result.
+
+An engine is read-only once built, so one instance is shared by every
+Streamlit session and thread: its index arrays are frozen (writeable=False),
+search() only allocates per-query masks and row ids, and rows() returns
+a new frame holding just the requested rows.
+"""
+
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from catalogue.descriptions import DESCRIPTION_COLUMN, DescriptionStore
+from catalogue.fulltext import FullTextIndex
+from catalogue.fuzzy import FuzzyIndex, FuzzyMatch
+from catalogue.index import CatalogueIndex
+from catalogue.planner import PlanStep, QueryPlanner
+from catalogue.store import CSV_PATH, file_sha1, file_version, load_catalogue_frame
+
+
+@dataclass
+class Query:
+    """
+    One Book Finder search. `include` / `exclude` map a facet column
+    (see FACET_COLUMNS) to the values selected for it. Not hashable (the
+    facet maps are dicts); caches key on result_cache.canonical_query().
+    """
+    text: str = ""
+    spice_include: Tuple[int, ...] = ()
+    spice_exclude: Tuple[int, ...] = ()
+    include: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    exclude: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    limit: Optional[int] = None   # None keeps every match (callers page through them)
+
+    def has_filters(self) -> bool:
+        return bool(
+            self.spice_include
+            or self.spice_exclude
+            or any(self.include.values())
+            or any(self.exclude.values())
+        )
+
+    def is_empty(self) -> bool:
+        return not self.text.strip() and not self.has_filters()
+
+
+@dataclass
+class SearchResult:
+    row_ids: np.ndarray            # matching rows (up to query.limit), best first
+    total: int                     # every row that matched
+    fuzzy_matches: List[FuzzyMatch] = field(default_factory=list)
+    facets: Dict[str, Counter] = field(default_factory=dict)  # counts over all matches
+    plan: List[PlanStep] = field(default_factory=list)        # how the filters ran
+
+    @property
+    def is_fuzzy(self) -> bool:
+        return bool(self.fuzzy_matches)
+
+    def page_count(self, page_size: int) -> int:
+        return max(1, -(-len(self.row_ids) // page_size))
+
+    def page(self, number: int, page_size: int) -> np.ndarray:
+        """Row ids on 0-based page `number`; empty past the last page."""
+        start = number * page_size
+        return self.row_ids[start:start + page_size]
+
+
+def freeze_arrays(obj: object) -> None:
+    """Mark every NumPy array attribute of `obj` (also inside lists / dicts) read-only."""
+    def freeze(value: object) -> None:
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                if isinstance(item, np.ndarray):
+                    item.flags.writeable = False
+        elif isinstance(value, dict):
+            for item in value.values():
+                freeze(item)
+
+    for value in vars(obj).values():
+        freeze(value)
+
+
+class CatalogueEngine:
+    def __init__(self, df: pd.DataFrame, version: str = "", descriptions: Optional[DescriptionStore] = None):
+        if descriptions is None:
+            texts = df[DESCRIPTION_COLUMN].tolist() if DESCRIPTION_COLUMN in df.columns else [""] * len(df)
+            descriptions = DescriptionStore.from_texts(texts)
+        if len(descriptions) != len(df):
+            raise ValueError(f"description store has {len(descriptions)} rows, catalogue has {len(df)}")
+        self.df = df.drop(columns=DESCRIPTION_COLUMN, errors="ignore").reset_index(drop=True)
+        self.descriptions = descriptions
+        self.version = version
+        self.index = CatalogueIndex(self.df)
+        self.fulltext = FullTextIndex(self.df, self.descriptions)
+        self.fuzzy = FuzzyIndex(self.df)
+        self.facet_counts: Dict[str, Counter] = self.index.facet_counts()
+        self.planner = QueryPlanner(self.index, self.fulltext)
+        # Shared across sessions: nothing may write into the indexes after this
+        for part in (self.index, *self.index.columns.values(), self.fulltext, self.fuzzy):
+            freeze_arrays(part)
+
+    @classmethod
+    def from_path(cls, csv_path: Path = CSV_PATH, version: Optional[str] = None) -> "CatalogueEngine":
+        """
+        Load csv_path (via its Parquet copy when fresh). With an up-to-date
+        description store the description column is never read.
+        """
+        source_hash = file_sha1(csv_path)
+        descriptions = DescriptionStore.open(csv_path, source_hash)
+        skip = (DESCRIPTION_COLUMN,) if descriptions is not None else ()
+        df = load_catalogue_frame(csv_path, skip=skip, source_hash=source_hash)
+        return cls(df, version=version or file_version(csv_path), descriptions=descriptions)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def search(self, query: Query) -> SearchResult:
+        row_ids, plan = self.planner.run(query)
+        fuzzy_matches: List[FuzzyMatch] = []
+
+        if query.text.strip() and not len(row_ids):
+            # Nothing exact: fall back to close title / author / series names
+            # among the rows the other filters allow
+            allowed, filter_plan = self.planner.run(query, text=False)
+            plan += filter_plan
+            start = time.perf_counter()
+            mask = np.zeros(len(self.df), dtype=bool)
+            mask[allowed] = True
+            row_ids = self.fuzzy.search(query.text, mask)
+            if len(row_ids):
+                fuzzy_matches = self.fuzzy.lookup(query.text)
+            plan.append(PlanStep(
+                f"fuzzy {query.text.strip()!r}", len(allowed), len(allowed), len(row_ids),
+                (time.perf_counter() - start) * 1000,
+            ))
+
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[row_ids] = True
+
+        return SearchResult(
+            row_ids=row_ids if query.limit is None else row_ids[:query.limit],
+            total=len(row_ids),
+            fuzzy_matches=fuzzy_matches,
+            facets=self.index.facet_counts(mask),
+            plan=plan,
+        )
+
+    def rows(self, row_ids: np.ndarray) -> pd.DataFrame:
+        """Materialise just the given rows, in order, with their descriptions (a new frame)."""
+        return self.df.iloc[row_ids].assign(**{DESCRIPTION_COLUMN: self.descriptions.many(row_ids)})
+
+    def cover_urls(self, row_ids: np.ndarray) -> List[str]:
+        """cover_url of the given rows, in order (no other column, no descriptions)."""
+        if "cover_url" not in self.df.columns:
+            return [""] * len(row_ids)
+        return self.df["cover_url"].iloc[row_ids].tolist()
@@ -0,0 +1,187 @@
+"""
+catalogue/fulltext.py
+
+In-process full-text index for the Book Finder query box.
+
+Title, author, series, tropes and description are accent- and case-folded,
+tokenized and merged into one weighted inverted index (term -> rows with a
+field-weighted term frequency), built with vectorized NumPy ops at load
+time. Queries are scored with BM25 and every query word must match,
+either exactly or, for words of PREFIX_MIN_LEN+ characters, as a prefix
+("enem" finds "enemies"). Work per query is proportional to the postings
+touched, not to the catalogue size. Descriptions can come from a
+DescriptionStore instead of the frame; they are then tokenized a block
+of rows at a time.
+"""
+
+import re
+import string
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from catalogue.descriptions import DESCRIPTION_COLUMN, DescriptionStore
+
+FIELD_WEIGHTS: Dict[str, float] = {
+    "title": 3.0,
+    "author": 2.5,
+    "series_name": 2.0,
+    "tropes": 1.5,
+    "description": 1.0,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+PREFIX_MIN_LEN = 3       # shorter words only match whole terms
+PREFIX_WEIGHT = 0.6      # prefix hits score lower than exact ones
+MAX_PREFIX_TERMS = 64    # cap expansion of very short prefixes
+
+COMBINING_RE = re.compile("[\u0300-\u036f]")
+PUNCTUATION_TABLE = str.maketrans(
+    {c: " " for c in string.punctuation + "’‘“”—–…«»¿¡·"}
+)
+ROW_SEP = "\x01"  # control char marking row boundaries in tokenize_column
+
+
+def fold(text: str) -> str:
+    """'Amélie' -> 'amelie': strip accents, casefold."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return COMBINING_RE.sub("", decomposed).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    return fold(text).translate(PUNCTUATION_TABLE).split()
+
+
+def tokenize_column(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tokenize every cell of a column in one pass over a single joined string
+    (far cheaper than per-row regexes). Returns parallel (row, token) arrays.
+    """
+    texts = series.fillna("").astype(str).tolist()
+    joined = f" {ROW_SEP} ".join(texts)
+    if joined.count(ROW_SEP) != max(len(texts) - 1, 0):
+        texts = [t.replace(ROW_SEP, " ") for t in texts]
+        joined = f" {ROW_SEP} ".join(texts)
+    tokens = np.array(tokenize(joined), dtype=object)
+    is_sep = tokens == ROW_SEP
+    rows = np.cumsum(is_sep)[~is_sep].astype(np.int64)
+    return rows, tokens[~is_sep]
+
+
+class FullTextIndex:
+    def __init__(self, df: pd.DataFrame, descriptions: Optional[DescriptionStore] = None):
+        self.n_rows = len(df)
+
+        rows_parts, terms_parts, weights_parts = [], [], []
+        for field, weight in FIELD_WEIGHTS.items():
+            if field in df.columns:
+                blocks = [(0, df[field])]
+            elif field == DESCRIPTION_COLUMN and descriptions is not None:
+                blocks = ((first, pd.Series(texts, dtype=object)) for first, texts in descriptions.chunks())
+            else:
+                continue
+            for first, column in blocks:
+                rows, tokens = tokenize_column(column)
+                rows_parts.append(rows + first)
+                terms_parts.append(tokens)
+                weights_parts.append(np.full(len(tokens), weight, dtype=np.float32))
+
+        if rows_parts:
+            rows = np.concatenate(rows_parts)
+            terms = np.concatenate(terms_parts)
+            weights = np.concatenate(weights_parts)
+        else:
+            rows = np.zeros(0, dtype=np.int64)
+            terms = np.zeros(0, dtype=object)
+            weights = np.zeros(0, dtype=np.float32)
+
+        # Sorted vocabulary so prefix lookups are a binary search
+        term_codes, vocab = pd.factorize(terms, sort=True)
+        self.vocab: List[str] = list(vocab)
+
+        # One posting per (term, row) with the summed field weight as tf
+        n = max(self.n_rows, 1)
+        keys = term_codes.astype(np.int64) * n + rows
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        tf = np.bincount(inverse, weights=weights).astype(np.float32)
+        posting_terms = unique_keys // n
+        self.post_rows = unique_keys % n
+        self.post_tf = tf
+        counts = np.bincount(posting_terms, minlength=len(self.vocab))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        # Weighted document lengths for BM25 length normalisation
+        self.doc_len = np.bincount(rows, weights=weights, minlength=self.n_rows).astype(np.float32)
+        avg = float(self.doc_len.mean()) if self.n_rows else 0.0
+        self.avg_doc_len = avg or 1.0
+        self.idf = np.log1p((self.n_rows - counts + 0.5) / (counts + 0.5)).astype(np.float32)
+
+    def _expand(self, word: str) -> List[Tuple[int, float]]:
+        """Term codes (with score multiplier) matched by one query word."""
+        start = bisect_left(self.vocab, word)
+        matches: List[Tuple[int, float]] = []
+        if start < len(self.vocab) and self.vocab[start] == word:
+            matches.append((start, 1.0))
+            start += 1
+        if len(word) >= PREFIX_MIN_LEN:
+            end = start
+            while (
+                end < len(self.vocab)
+                and end - start < MAX_PREFIX_TERMS
+                and self.vocab[end].startswith(word)
+            ):
+                matches.append((end, PREFIX_WEIGHT))
+                end += 1
+        return matches
+
+    def estimate(self, query: str) -> int:
+        """
+        Upper bound on rows matching `query`: the smallest document frequency
+        among its words (prefix expansions summed). 0 means no match at all.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return 0
+        bound = self.n_rows
+        for word in words:
+            df = sum(int(self.offsets[code + 1] - self.offsets[code]) for code, _ in self._expand(word))
+            bound = min(bound, df)
+        return bound
+
+    def search(self, query: str, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows matching every word of `query` (and `mask`, if given), best first.
+        Returns (row_ids, scores). An empty query matches nothing.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        if not words or self.n_rows == 0:
+            return empty
+
+        scores = np.zeros(self.n_rows, dtype=np.float32)
+        matched = mask.copy() if mask is not None else np.ones(self.n_rows, dtype=bool)
+
+        for word in words:
+            terms = self._expand(word)
+            if not terms:
+                return empty
+            word_hit = np.zeros(self.n_rows, dtype=bool)
+            for code, multiplier in terms:
+                lo, hi = self.offsets[code], self.offsets[code + 1]
+                rows = self.post_rows[lo:hi]
+                tf = self.post_tf[lo:hi]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[rows] / self.avg_doc_len)
+                scores[rows] += multiplier * self.idf[code] * tf * (BM25_K1 + 1) / (tf + norm)
+                word_hit[rows] = True
+            matched &= word_hit
+            if not matched.any():
+                return empty
+
+        row_ids = np.flatnonzero(matched)
+        order = np.argsort(-scores[row_ids], kind="stable")  # ties keep CSV order
+        row_ids = row_ids[order]
+        return row_ids, scores[row_ids]
@@ -0,0 +1,185 @@
+"""
+catalogue/fuzzy.py
+
+Typo-tolerant lookup over titles, authors and series names, used by Book
+Finder when the exact full-text path finds nothing ("Sara J Maas").
+
+Distinct names are normalized (accent/case folded, punctuation dropped)
+and indexed by character trigrams once at load time. A lookup counts
+shared trigrams to pick a handful of candidates, then confirms them with
+a bounded edit distance, so it never scans the whole catalogue. Titles
+and series also get an acronym key, so "acotar" finds
+"A Court of Thorns and Roses".
+"""
+
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from catalogue.fulltext import tokenize
+
+
+FUZZY_FIELDS = ["title", "author", "series_name"]
+ACRONYM_FIELDS = {"title", "series_name"}
+
+MIN_SIMILARITY = 0.3   # trigram Dice coefficient needed to be a candidate
+MAX_CANDIDATES = 20    # candidates checked with edit distance per lookup
+MIN_ACRONYM_WORDS = 3
+
+
+class FuzzyMatch(NamedTuple):
+    label: str            # the catalogue spelling that matched
+    field: str
+    distance: int         # edits away from the query (0 for acronyms)
+    row_ids: np.ndarray
+
+
+def normalize_name(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def acronym(normalized: str) -> str:
+    words = normalized.split()
+    if len(words) < MIN_ACRONYM_WORDS:
+        return ""
+    return "".join(w[0] for w in words)
+
+
+def trigrams(normalized: str) -> List[str]:
+    padded = f"  {normalized} "
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def edit_budget(length: int) -> int:
+    if length <= 4:
+        return 1
+    if length <= 12:
+        return 2
+    return 3
+
+
+def bounded_levenshtein(a: str, b: str, max_dist: int) -> int:
+    """
+    Levenshtein distance, or max_dist + 1 once it must exceed max_dist.
+    Only the diagonal band |i - j| <= max_dist is computed.
+    """
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    too_far = max_dist + 1
+    prev = [j if j <= max_dist else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - max_dist)
+        hi = min(len(b), i + max_dist)
+        cur = [too_far] * (len(b) + 1)
+        cur[0] = i if i <= max_dist else too_far
+        ca = a[i - 1]
+        best = cur[0]
+        for j in range(lo, hi + 1):
+            cost = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < cost:
+                cost = prev[j] + 1
+            if cur[j - 1] + 1 < cost:
+                cost = cur[j - 1] + 1
+            cur[j] = cost
+            if cost < best:
+                best = cost
+        if best > max_dist:
+            return too_far
+        prev = cur
+    return min(prev[-1], too_far)
+
+
+class FuzzyIndex:
+    def __init__(self, df: pd.DataFrame):
+        self.keys: List[str] = []        # normalized names
+        self.labels: List[str] = []      # first spelling seen
+        self.fields: List[str] = []
+        key_rows: List[List[int]] = []
+        key_lookup: Dict[tuple, int] = {}
+        self.acronyms: Dict[str, List[int]] = {}
+
+        for field in FUZZY_FIELDS:
+            if field not in df.columns:
+                continue
+            cell_codes, cells = pd.factorize(df[field].fillna("").astype(str).to_numpy(dtype=object))
+            cell_keys: List[List[int]] = []
+            for cell in cells:
+                parts = cell.split(",") if field == "author" else [cell]
+                ids = []
+                for part in parts:
+                    norm = normalize_name(part)
+                    if not norm:
+                        continue
+                    key = key_lookup.get((field, norm))
+                    if key is None:
+                        key = key_lookup[(field, norm)] = len(self.keys)
+                        self.keys.append(norm)
+                        self.labels.append(part.strip())
+                        self.fields.append(field)
+                        key_rows.append([])
+                        if field in ACRONYM_FIELDS and acronym(norm):
+                            self.acronyms.setdefault(acronym(norm), []).append(key)
+                    ids.append(key)
+                cell_keys.append(ids)
+            for row, code in enumerate(cell_codes):
+                for key in cell_keys[code]:
+                    key_rows[key].append(row)
+
+        self.key_rows = [np.array(rows, dtype=np.int64) for rows in key_rows]
+
+        # Trigram -> key ids, CSR layout
+        grams_per_key = [trigrams(k) for k in self.keys]
+        self.key_gram_count = np.array([len(g) for g in grams_per_key], dtype=np.int64)
+        flat = [g for grams in grams_per_key for g in grams]
+        owners = np.repeat(np.arange(len(self.keys), dtype=np.int64), self.key_gram_count)
+        gram_codes, grams = pd.factorize(np.array(flat, dtype=object))
+        self.gram_ids: Dict[str, int] = {g: i for i, g in enumerate(grams)}
+        order = np.argsort(gram_codes, kind="stable")
+        self.gram_keys = owners[order]
+        counts = np.bincount(gram_codes, minlength=len(grams))
+        self.gram_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def lookup(self, query: str, limit: int = 5) -> List[FuzzyMatch]:
+        """Best matching names within the edit budget, closest first."""
+        norm = normalize_name(query)
+        if not norm or not self.keys:
+            return []
+
+        found: Dict[int, int] = {}
+        for key in self.acronyms.get(norm.replace(" ", ""), []):
+            found[key] = 0
+
+        query_grams = trigrams(norm)
+        postings = [
+            self.gram_keys[self.gram_offsets[g]:self.gram_offsets[g + 1]]
+            for g in (self.gram_ids.get(q) for q in query_grams)
+            if g is not None
+        ]
+        if postings:
+            shared = np.bincount(np.concatenate(postings), minlength=len(self.keys))
+            dice = 2 * shared / (len(query_grams) + self.key_gram_count)
+            keys = np.flatnonzero(dice >= MIN_SIMILARITY)
+            best = keys[np.argsort(-dice[keys], kind="stable")[:MAX_CANDIDATES]]
+            budget = edit_budget(len(norm))
+            for key in best:
+                dist = bounded_levenshtein(norm, self.keys[key], budget)
+                if dist <= budget and dist < found.get(key, budget + 1):
+                    found[key] = dist
+
+        ranked = sorted(found.items(), key=lambda kv: (kv[1], FUZZY_FIELDS.index(self.fields[kv[0]])))
+        return [
+            FuzzyMatch(self.labels[k], self.fields[k], d, self.key_rows[k])
+            for k, d in ranked[:limit]
+        ]
+
+    def search(self, query: str, mask: Optional[np.ndarray] = None, limit: int = 5) -> np.ndarray:
+        """Row ids of the best fuzzy matches (closest names first), optionally masked."""
+        seen = set()
+        out: List[int] = []
+        for match in self.lookup(query, limit=limit):
+            for row in match.row_ids:
+                if row not in seen and (mask is None or mask[row]):
+                    seen.add(row)
+                    out.append(int(row))
+        return np.array(out, dtype=np.int64)
@@ -0,0 +1,205 @@
+"""
+catalogue/index.py
+
+Pre-tokenized index over the pipe-separated catalogue columns
+('Enemies to Lovers|Slow Burn', ...), built once when the catalogue loads.
+
+Each column is split into normalized values and stored as an inverted
+index: value -> sorted array of row positions. Include / exclude filters
+then become NumPy mask operations instead of a Python lambda per row.
+
+Matching keeps the Book Finder semantics: a selected value matches a cell
+when it appears (case-insensitively) inside one of the cell's values, so
+"Grumpy" still matches "Grumpy / Sunshine".
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+FACET_COLUMNS = [
+    "genres",
+    "relationship",
+    "tropes",
+    "content_warnings",
+    "hero_traits",
+    "heroine_traits",
+]
+
+
+def normalize_value(value: str) -> str:
+    """Lowercase and collapse whitespace: '  Slow  Burn ' -> 'slow burn'."""
+    return " ".join(str(value).lower().split())
+
+
+class PipeColumnIndex:
+    """Inverted index for a single pipe-separated column."""
+
+    def __init__(self, series: pd.Series):
+        self.n_rows = len(series)
+
+        # Split each distinct cell string once; catalogues repeat the same
+        # combinations a lot, so this is much cheaper than splitting per row.
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Already dictionary-encoded (e.g. loaded from Parquet)
+            distinct_cells = [str(c) for c in series.cat.categories] + [""]
+            cell_codes = series.cat.codes.to_numpy().astype(np.int64)
+            cell_codes[cell_codes < 0] = len(distinct_cells) - 1
+        else:
+            cells = series.fillna("").astype(str).to_numpy(dtype=object)
+            cell_codes, distinct_cells = pd.factorize(cells)
+        value_codes: Dict[str, int] = {}
+        self.labels: List[str] = []
+        cell_values: List[int] = []
+        cell_lengths = np.zeros(len(distinct_cells), dtype=np.int64)
+        for i, cell in enumerate(distinct_cells):
+            for part in cell.split("|"):
+                label = part.strip()
+                if not label:
+                    continue
+                norm = normalize_value(label)
+                code = value_codes.get(norm)
+                if code is None:
+                    code = value_codes[norm] = len(self.labels)
+                    self.labels.append(label)
+                cell_values.append(code)
+                cell_lengths[i] += 1
+        self.vocab: List[str] = list(value_codes)
+
+        # Expand (distinct cell -> values) back out to (row, value) pairs
+        cell_values_arr = np.array(cell_values, dtype=np.int64)
+        cell_starts = np.concatenate([[0], np.cumsum(cell_lengths)[:-1]]).astype(np.int64)
+        lengths = cell_lengths[cell_codes]
+        rows = np.repeat(np.arange(self.n_rows, dtype=np.int64), lengths)
+        run_starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        within = np.arange(len(rows), dtype=np.int64) - run_starts
+        codes = cell_values_arr[np.repeat(cell_starts[cell_codes], lengths) + within]
+
+        # CSR layout: rows for code c are row_ids[offsets[c]:offsets[c + 1]]
+        order = np.argsort(codes, kind="stable")
+        self.row_ids = rows[order]
+        self.pair_codes = codes[order]
+        counts = np.bincount(codes, minlength=len(self.vocab))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.value_sizes = counts.astype(np.int64)   # rows per value, for the planner
+
+        self._match_cache: Dict[str, np.ndarray] = {}
+
+    def value_counts(self, mask: Optional[np.ndarray] = None) -> Counter:
+        """
+        Counter of value label -> number of rows, over the whole column or
+        only the rows selected by `mask` (one gather + one bincount).
+        """
+        if mask is None or not self.vocab:
+            counts = np.diff(self.offsets)
+        else:
+            # Codes of the (row, value) pairs whose row is selected; a code
+            # may have no rows at all (unused categories), so no reduceat.
+            counts = np.bincount(self.pair_codes[mask[self.row_ids]], minlength=len(self.vocab))
+        return Counter({label: int(n) for label, n in zip(self.labels, counts) if n})
+
+    def rows_for_code(self, code: int) -> np.ndarray:
+        return self.row_ids[self.offsets[code]:self.offsets[code + 1]]
+
+    def matching_codes(self, selected: str) -> np.ndarray:
+        """Codes of every vocabulary value that contains `selected`."""
+        needle = normalize_value(selected)
+        codes = self._match_cache.get(needle)
+        if codes is None:
+            codes = np.array(
+                [code for code, value in enumerate(self.vocab) if needle in value],
+                dtype=np.int64,
+            )
+            codes.flags.writeable = False   # shared by every session using this index
+            self._match_cache[needle] = codes
+        return codes
+
+    def estimate(self, selected: Sequence[str]) -> int:
+        """Upper bound on rows matching ANY selected value (no row lookups)."""
+        codes = [self.matching_codes(value) for value in selected]
+        codes = np.unique(np.concatenate(codes)) if codes else np.zeros(0, dtype=np.int64)
+        return min(int(self.value_sizes[codes].sum()), self.n_rows)
+
+    def any_mask(self, selected: Sequence[str]) -> np.ndarray:
+        """Boolean row mask: True where the cell matches ANY selected value."""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for value in selected:
+            for code in self.matching_codes(value):
+                mask[self.rows_for_code(code)] = True
+        return mask
+
+
+class CatalogueIndex:
+    """Per-column indexes for one loaded catalogue DataFrame."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        self.columns: Dict[str, PipeColumnIndex] = {
+            col: PipeColumnIndex(df[col]) for col in FACET_COLUMNS if col in df.columns
+        }
+        self.spice: Optional[np.ndarray] = None
+        if "spice_level" in df.columns:
+            self.spice = pd.to_numeric(df["spice_level"], errors="coerce").to_numpy(dtype=float)
+            # Dense codes for counting: spice_levels[code], missing -> len(spice_levels)
+            known = ~np.isnan(self.spice)
+            self.spice_levels, codes = np.unique(self.spice[known].astype(int), return_inverse=True)
+            self.spice_codes = np.full(self.n_rows, len(self.spice_levels), dtype=np.int64)
+            self.spice_codes[known] = codes
+            self.spice_sizes = np.bincount(codes, minlength=len(self.spice_levels))
+
+    def facet_counts(self, mask: Optional[np.ndarray] = None) -> Dict[str, Counter]:
+        """
+        Value counts for spice_level and every facet column, restricted to
+        `mask` when given (e.g. the current search results).
+        """
+        counts: Dict[str, Counter] = {}
+        if self.spice is not None:
+            codes = self.spice_codes if mask is None else self.spice_codes[mask]
+            n = np.bincount(codes, minlength=len(self.spice_levels) + 1)[:-1]
+            counts["spice_level"] = Counter(
+                {int(level): int(k) for level, k in zip(self.spice_levels, n) if k}
+            )
+        else:
+            counts["spice_level"] = Counter()
+        for col in FACET_COLUMNS:
+            column = self.columns.get(col)
+            counts[col] = column.value_counts(mask) if column is not None else Counter()
+        return counts
+
+    def all_rows(self) -> np.ndarray:
+        return np.ones(self.n_rows, dtype=bool)
+
+    def include_any(self, col: str, selected: Sequence[str]) -> np.ndarray:
+        """Rows where `col` contains ANY selected value (all rows if nothing selected)."""
+        if not selected or col not in self.columns:
+            return self.all_rows()
+        return self.columns[col].any_mask(selected)
+
+    def exclude_any(self, col: str, selected: Sequence[str]) -> np.ndarray:
+        """Rows where `col` contains NONE of the selected values."""
+        if not selected or col not in self.columns:
+            return self.all_rows()
+        return ~self.columns[col].any_mask(selected)
+
+    def spice_in(self, levels: Sequence[int]) -> np.ndarray:
+        if not levels or self.spice is None:
+            return self.all_rows()
+        return np.isin(self.spice, levels)
+
+    def spice_estimate(self, levels: Sequence[int]) -> int:
+        """Rows whose spice level is one of `levels` (exact, from precomputed counts)."""
+        if self.spice is None:
+            return self.n_rows
+        return int(self.spice_sizes[np.isin(self.spice_levels, levels)].sum())
+
+    def spice_in_rows(self, levels: Sequence[int], row_ids: np.ndarray) -> np.ndarray:
+        """spice_in(levels) restricted to `row_ids` (touches only those rows)."""
+        return np.isin(self.spice[row_ids], levels)
+
+    def spice_not_in(self, levels: Sequence[int]) -> np.ndarray:
+        if not levels or self.spice is None:
+            return self.all_rows()
+        return ~np.isin(self.spice, levels)
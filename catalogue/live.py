@@ -0,0 +1,143 @@
+"""
+catalogue/live.py
+
+Hot reload for a long-running app: a LiveCatalogue holds the current
+engine for a catalogue file and replaces it when the file changes.
+
+- A daemon thread stat()s the file every POLL_INTERVAL seconds. Only
+  when mtime/size move is the content hashed, and only a new hash
+  triggers a rebuild (a checkout that rewrites identical bytes doesn't).
+- The new engine is built on that thread, then swapped in with a single
+  reference assignment. Readers take `current` once per request and keep
+  using that object, so in-flight searches finish against the old version
+  and never wait on a rebuild.
+- A failed rebuild (half-copied file, parse error) is logged and the old
+  engine keeps serving; the next change is tried again.
+- Several sources can be given in order of preference, e.g. the SQLite
+  database, else the CSV. The first whose file exists is served, so when
+  the database appears (or goes away) the same LiveCatalogue switches
+  backend; there is never a second watcher.
+- A replaced engine with a close() (SqliteCatalogue's connections) is
+  closed RETIRE_AFTER seconds later, once readers have moved on.
+
+Engines are versioned by content hash (see `version`), which is what
+caches keyed on the catalogue version use.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from catalogue.store import file_sha1, file_version
+
+
+POLL_INTERVAL = 15.0   # seconds between stat() checks
+VERSION_LENGTH = 12    # hex chars of the content hash used as version
+RETIRE_AFTER = 60.0    # seconds a replaced engine stays open for in-flight searches
+
+Source = Tuple[Path, Callable[[Path, str], Any]]
+
+
+def content_version(path: Path) -> str:
+    return file_sha1(path)[:VERSION_LENGTH]
+
+
+class LiveCatalogue:
+    """
+    `sources` are (path, build) pairs, most preferred first;
+    `build(path, version)` returns a search engine (CatalogueEngine or
+    SqliteCatalogue). The first one is built before the constructor returns.
+    """
+
+    def __init__(self, sources: Sequence[Source], poll_interval: Optional[float] = POLL_INTERVAL):
+        self.sources = list(sources)
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.loaded_at = time.time()
+        self.last_error: Optional[str] = None
+        self._retired: List[Tuple[float, Any]] = []
+
+        self.path, self.build = self._pick_source()
+        self._stat_key = file_version(self.path)
+        self._engine = self.build(self.path, content_version(self.path))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if poll_interval:
+            self._thread = threading.Thread(
+                target=self._watch, name=f"catalogue-watch-{self.path.name}", daemon=True
+            )
+            self._thread.start()
+
+    @property
+    def current(self) -> Any:
+        """The engine to use for one request; hold on to it rather than re-reading."""
+        return self._engine
+
+    @property
+    def version(self) -> str:
+        return self._engine.version
+
+    def _pick_source(self) -> Source:
+        for path, build in self.sources:
+            if path.exists():
+                return path, build
+        # Nothing there (mid-replace?): keep the current source, or fail on the last
+        return (self.path, self.build) if hasattr(self, "path") else self.sources[-1]
+
+    def check(self) -> bool:
+        """Rebuild if the file (or the preferred source) changed; True when a new version was swapped in."""
+        self._close_retired()
+        path, build = self._pick_source()
+        switching = path != self.path
+        try:
+            stat_key = file_version(path)
+            if stat_key == self._stat_key and not switching:
+                return False
+            version = content_version(path)
+        except OSError:
+            return False   # mid-replace or gone: keep serving what we have
+        if not switching:
+            self._stat_key = stat_key
+            if version == self.version:
+                return False
+
+        start = time.perf_counter()
+        try:
+            engine = build(path, version)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Reloading {path.name} failed, still serving {self.version}: {self.last_error}")
+            return False
+        if switching:
+            print(f"Switching catalogue from {self.path.name} to {path.name}")
+            self.path, self.build, self._stat_key = path, build, stat_key
+        self._retired.append((time.time(), self._engine))
+        self._engine = engine
+        self.reloads += 1
+        self.loaded_at = time.time()
+        self.last_error = None
+        print(f"Reloaded {path.name} as version {version} in {time.perf_counter() - start:.1f} s")
+        return True
+
+    def _close_retired(self, older_than: float = RETIRE_AFTER) -> None:
+        now = time.time()
+        keep = []
+        for retired_at, engine in self._retired:
+            if now - retired_at < older_than:
+                keep.append((retired_at, engine))
+            elif hasattr(engine, "close"):
+                engine.close()
+        self._retired = keep
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        self._close_retired(older_than=0)
+        if hasattr(self._engine, "close"):
+            self._engine.close()
@@ -0,0 +1,153 @@
+"""
+catalogue/planner.py
+
+Selectivity-ordered evaluation of a Query's filters.
+
+Every active filter (spice include / exclude, each facet's include /
+exclude, the text query) becomes a predicate with an estimated number of
+surviving rows, read from counts precomputed at load time (rows per facet
+value, rows per spice level, document frequency per term). Predicates run
+most selective first:
+
+- the first one produces a row-id array (for text: ranked best first),
+- each later one only filters that array, keeping its order,
+- as soon as nothing is left the rest are skipped.
+
+Every run records a PlanStep per predicate (estimate, rows in / out,
+time), shown by Book Finder's debug panel and format_plan().
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from catalogue.fulltext import FullTextIndex
+from catalogue.index import FACET_COLUMNS, CatalogueIndex
+
+# Tie-break for equal estimates: cheapest predicate first
+COST_SPICE, COST_FACET, COST_TEXT = 0, 1, 2
+
+
+@dataclass
+class PlanStep:
+    predicate: str
+    estimate: int      # rows expected to survive this predicate on its own
+    rows_in: int
+    rows_out: int
+    ms: float
+    skipped: bool = False
+
+
+@dataclass
+class Predicate:
+    label: str
+    estimate: int
+    cost: int
+    seed: Callable[[], np.ndarray]                  # matching row ids, in result order
+    keep: Callable[[np.ndarray], np.ndarray]        # row ids -> bool "still matches"
+    upper_bound: bool = True    # estimate never undercounts, so 0 means no match
+
+
+class QueryPlanner:
+    def __init__(self, index: CatalogueIndex, fulltext: FullTextIndex):
+        self.index = index
+        self.fulltext = fulltext
+        self.n_rows = index.n_rows
+
+    def predicates(self, query, text: bool = True) -> List[Predicate]:
+        """Active predicates of `query`, in evaluation order."""
+        index, n = self.index, self.n_rows
+        preds: List[Predicate] = []
+
+        if index.spice is not None:
+            if query.spice_include:
+                levels = tuple(query.spice_include)
+                preds.append(Predicate(
+                    f"spice in {levels}", index.spice_estimate(levels), COST_SPICE,
+                    seed=lambda levels=levels: np.flatnonzero(index.spice_in(levels)),
+                    keep=lambda rows, levels=levels: index.spice_in_rows(levels, rows),
+                ))
+            if query.spice_exclude:
+                levels = tuple(query.spice_exclude)
+                preds.append(Predicate(
+                    f"spice not in {levels}", n - index.spice_estimate(levels), COST_SPICE,
+                    seed=lambda levels=levels: np.flatnonzero(index.spice_not_in(levels)),
+                    keep=lambda rows, levels=levels: ~index.spice_in_rows(levels, rows),
+                ))
+
+        for col in FACET_COLUMNS:
+            column = index.columns.get(col)
+            if column is None:
+                continue
+            selected = tuple(query.include.get(col, ()))
+            if selected:
+                preds.append(Predicate(
+                    f"{col} has any {list(selected)}", column.estimate(selected), COST_FACET,
+                    seed=lambda c=column, s=selected: np.flatnonzero(c.any_mask(s)),
+                    keep=lambda rows, c=column, s=selected: c.any_mask(s)[rows],
+                ))
+            selected = tuple(query.exclude.get(col, ()))
+            if selected:
+                preds.append(Predicate(
+                    f"{col} has none of {list(selected)}", n - column.estimate(selected), COST_FACET,
+                    seed=lambda c=column, s=selected: np.flatnonzero(~c.any_mask(s)),
+                    keep=lambda rows, c=column, s=selected: ~c.any_mask(s)[rows],
+                    upper_bound=False,   # n minus an upper bound: a lower bound
+                ))
+
+        if text and query.text.strip():
+            words = query.text.strip()
+            preds.append(Predicate(
+                f"text {words!r}", self.fulltext.estimate(words), COST_TEXT,
+                seed=lambda: self.fulltext.search(words)[0],
+                keep=lambda rows: self._text_keep(words, rows),
+            ))
+
+        preds.sort(key=lambda p: (p.estimate, p.cost))
+        return preds
+
+    def _text_keep(self, words: str, rows: np.ndarray) -> np.ndarray:
+        # Text decides the order, so "keep" re-ranks: it returns the ranked
+        # surviving ids rather than a mask (see run()).
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return self.fulltext.search(words, mask)[0]
+
+    def run(self, query, text: bool = True) -> Tuple[np.ndarray, List[PlanStep]]:
+        """Row ids matching every predicate (ranked when there is text) and the trace."""
+        start = time.perf_counter()
+        preds = self.predicates(query, text=text)
+        steps = [PlanStep("plan (estimates + ordering)", len(preds), self.n_rows, self.n_rows,
+                          (time.perf_counter() - start) * 1000)]
+        rows: Optional[np.ndarray] = None
+        for pred in preds:
+            rows_in = self.n_rows if rows is None else len(rows)
+            if rows is not None and not len(rows):
+                steps.append(PlanStep(pred.label, pred.estimate, 0, 0, 0.0, skipped=True))
+                continue
+            start = time.perf_counter()
+            if pred.upper_bound and pred.estimate == 0:
+                rows = np.zeros(0, dtype=np.int64)
+            elif rows is None:
+                rows = pred.seed()
+            elif pred.cost == COST_TEXT:
+                rows = pred.keep(rows)
+            else:
+                rows = rows[pred.keep(rows)]
+            steps.append(PlanStep(
+                pred.label, pred.estimate, rows_in, len(rows),
+                (time.perf_counter() - start) * 1000,
+            ))
+        if rows is None:
+            rows = np.arange(self.n_rows, dtype=np.int64)
+        return rows, steps
+
+
+def format_plan(steps: List[PlanStep]) -> str:
+    lines = [f"{'predicate':<48} {'estimate':>9} {'in':>9} {'out':>9} {'ms':>8}"]
+    for s in steps:
+        out = "skipped" if s.skipped else f"{s.rows_out:>9}"
+        lines.append(f"{s.predicate[:48]:<48} {s.estimate:>9} {s.rows_in:>9} {out:>9} {s.ms:>8.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,175 @@
+"""
+catalogue/result_cache.py
+
+Process-wide LRU cache of search results, shared by every Book Finder
+session (readers tend to submit the same few filter combinations).
+
+- Key: the catalogue version plus a canonical form of the Query: text
+  tokenized the way the indexes see it, include / exclude values
+  normalized and sorted, empty facets dropped. "Enemies to Lovers" +
+  spice 4 hits the same entry however the sidebar was clicked.
+- Value: the SearchResult, with its row ids (and the fuzzy matches' row
+  ids) stored as compact read-only arrays. Memory is bounded by the
+  bytes of every entry (result_nbytes: all id arrays, facet counters,
+  plan; max_bytes) and by max_entries; least recently used entries go
+  first.
+- A catalogue version seen for the first time drops every entry of the
+  previous one. Searches still running against an older version (during
+  a hot reload) are answered but not cached.
+
+hits / misses / evictions are kept for the Book Finder debug panel.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from catalogue.engine import Query, SearchResult
+from catalogue.fulltext import tokenize
+from catalogue.index import normalize_value
+
+
+MAX_CACHED_BYTES = 32 * 1024 * 1024   # across all entries, see result_nbytes
+MAX_CACHED_ENTRIES = 1024
+KEPT_VERSIONS = 4            # recently retired versions remembered as stale
+
+
+def canonical_query(query: Query) -> Tuple:
+    """Hashable key that is equal for queries the engines treat the same."""
+    def facets(selected: Dict[str, Tuple[str, ...]]) -> Tuple:
+        return tuple(sorted(
+            (col, tuple(sorted({normalize_value(v) for v in values})))
+            for col, values in selected.items() if values
+        ))
+
+    return (
+        " ".join(tokenize(query.text)),
+        tuple(sorted(set(query.spice_include))),
+        tuple(sorted(set(query.spice_exclude))),
+        facets(query.include),
+        facets(query.exclude),
+        query.limit,
+    )
+
+
+def compact_ids(row_ids: np.ndarray) -> np.ndarray:
+    """Read-only int32 copy of row ids when they fit (half the memory of int64)."""
+    if len(row_ids) and int(row_ids.max()) >= np.iinfo(np.int32).max:
+        ids = np.array(row_ids, dtype=np.int64)
+    else:
+        ids = np.asarray(row_ids, dtype=np.int32).copy()
+    ids.flags.writeable = False
+    return ids
+
+
+def compact_result(result: SearchResult) -> SearchResult:
+    """The result with every id array (its own and the fuzzy matches') compacted."""
+    return replace(
+        result,
+        row_ids=compact_ids(result.row_ids),
+        fuzzy_matches=[m._replace(row_ids=compact_ids(m.row_ids)) for m in result.fuzzy_matches],
+    )
+
+
+def result_nbytes(result: SearchResult) -> int:
+    """Approximate memory a cached result holds (facet labels are shared with the index)."""
+    return (
+        result.row_ids.nbytes
+        + sum(m.row_ids.nbytes + sys.getsizeof(m) for m in result.fuzzy_matches)
+        + sum(sys.getsizeof(counts) for counts in result.facets.values())
+        + sys.getsizeof(result.facets)
+        + sum(sys.getsizeof(step) for step in result.plan)
+        + sys.getsizeof(result)
+    )
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int = MAX_CACHED_BYTES, max_entries: int = MAX_CACHED_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.version: Optional[str] = None
+        self._retired: List[str] = []
+        self._entries: "OrderedDict[Tuple, Tuple[SearchResult, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.uncached = 0   # stale-version or oversized results
+
+    def search(self, engine: Any, query: Query) -> SearchResult:
+        """engine.search(query), answered from the cache when possible."""
+        version = engine.version
+        key = (version, canonical_query(query))
+        with self._lock:
+            current = self._switch_version(version)
+            if current:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+            self.misses += 1
+
+        # Searching happens outside the lock; two sessions missing the
+        # same key at once both compute it and the second put wins.
+        result = engine.search(query)
+        result = compact_result(result)
+        nbytes = result_nbytes(result)
+        with self._lock:
+            if not current or version != self.version or nbytes > self.max_bytes:
+                self.uncached += 1
+            else:
+                self._put(key, result, nbytes)
+        return result
+
+    def _switch_version(self, version: str) -> bool:
+        """Track the catalogue version; False if `version` is a retired one."""
+        if version == self.version:
+            return True
+        if version in self._retired:
+            return False
+        if self.version is not None:
+            self._retired = (self._retired + [self.version])[-KEPT_VERSIONS:]
+            self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+        self.version = version
+        return True
+
+    def _put(self, key: Tuple, result: SearchResult, nbytes: int) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (result, nbytes)
+        self._bytes += nbytes
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "stored ids": sum(len(r.row_ids) for r, _ in self._entries.values()),
+                "stored MB": round(self._bytes / 1e6, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidated": self.invalidations,
+                "uncached": self.uncached,
+            }
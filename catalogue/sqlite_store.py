@@ -0,0 +1,482 @@
+"""
+catalogue/sqlite_store.py
+
+Optional SQLite backend for the catalogue (data/romance_catalogue.sqlite).
+
+Schema:
+- books: one row per book, unique by link, with the CSV's technical and
+  curated columns; any other curated CSV column is kept as JSON in `extra`
+- facet_values / book_facets: the pipe-separated facet columns (genres,
+  relationship, tropes, content warnings, hero / heroine traits) as a
+  normalized many-to-many table, indexed from both sides
+- books_fts: FTS5 index over title, author, series, tropes and
+  description (rowid = book_id), refreshed whenever a book is upserted
+
+The backend is opt-in. Create the database from the CSV with
+
+    python -m catalogue.sqlite_store import
+
+From then on update_romance_catalogue.py upserts every crawl into it
+(row by row, keyed on link) and Book Finder queries it directly through
+SqliteCatalogue instead of loading the CSV. Re-run `import` after
+hand-editing the CSV; `export` writes the database back out in the CSV
+layout.
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from catalogue.engine import Query, SearchResult
+from catalogue.fulltext import FIELD_WEIGHTS, PREFIX_MIN_LEN, tokenize
+from catalogue.index import FACET_COLUMNS, normalize_value
+from catalogue.store import CSV_PATH, atomic_replace, file_version
+
+
+DB_PATH = CSV_PATH.with_suffix(".sqlite")
+
+# Columns stored directly on `books`; FACET_COLUMNS live in book_facets and
+# anything else goes to books.extra
+BOOK_COLUMNS = [
+    "id", "title", "author", "series_name", "series_order", "year",
+    "description", "link", "cover_url", "spice_level", "notes",
+]
+# What an ingester crawl may refresh on a known book; curated columns (and
+# the catalogue id, which crawls number per run) are left alone
+CRAWL_COLUMNS = [
+    "title", "author", "series_name", "series_order", "year",
+    "description", "link", "cover_url",
+]
+# Same fields and weights as the in-memory FullTextIndex
+FTS_COLUMNS = list(FIELD_WEIGHTS)
+BATCH_SIZE = 500   # ids per IN (...); SQLite before 3.32 allows at most 999 bound variables
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    book_id      INTEGER PRIMARY KEY,
+    link         TEXT UNIQUE,
+    id           TEXT NOT NULL DEFAULT '',
+    title        TEXT NOT NULL DEFAULT '',
+    author       TEXT NOT NULL DEFAULT '',
+    series_name  TEXT NOT NULL DEFAULT '',
+    series_order TEXT NOT NULL DEFAULT '',
+    year         TEXT NOT NULL DEFAULT '',
+    description  TEXT NOT NULL DEFAULT '',
+    cover_url    TEXT NOT NULL DEFAULT '',
+    spice_level  INTEGER,
+    notes        TEXT NOT NULL DEFAULT '',
+    extra        TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS books_spice ON books(spice_level);
+CREATE INDEX IF NOT EXISTS books_unlinked ON books(title, author) WHERE link IS NULL;
+
+CREATE TABLE IF NOT EXISTS facet_values (
+    value_id INTEGER PRIMARY KEY,
+    facet    TEXT NOT NULL,
+    label    TEXT NOT NULL,
+    norm     TEXT NOT NULL,
+    UNIQUE (facet, norm)
+);
+
+CREATE TABLE IF NOT EXISTS book_facets (
+    value_id INTEGER NOT NULL REFERENCES facet_values(value_id),
+    book_id  INTEGER NOT NULL REFERENCES books(book_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (value_id, book_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS book_facets_book ON book_facets(book_id, position);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+    title, author, series_name, tropes, description,
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+# ------------------- WRITING -------------------
+
+def connect(db_path: Path = DB_PATH) -> sqlite3.Connection:
+    """Open (and if needed create) the catalogue database for writing."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parse_spice(value: Any) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def split_facet(cell: str) -> List[str]:
+    return [part.strip() for part in (cell or "").split("|") if part.strip()]
+
+
+def _stored_columns(conn: sqlite3.Connection) -> List[str]:
+    row = conn.execute("SELECT value FROM meta WHERE key = 'columns'").fetchone()
+    return json.loads(row[0]) if row else []
+
+
+def get_columns(conn: sqlite3.Connection) -> List[str]:
+    """CSV column order recorded by the imports / upserts so far."""
+    return _stored_columns(conn) or BOOK_COLUMNS + FACET_COLUMNS
+
+
+def _record_columns(conn: sqlite3.Connection, columns: List[str]) -> None:
+    merged = list(dict.fromkeys(_stored_columns(conn) + columns))
+    conn.execute(
+        "INSERT INTO meta(key, value) VALUES ('columns', ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (json.dumps(merged),),
+    )
+
+
+class _FacetIds:
+    """(facet, normalized value) -> value_id, creating values on first use."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.ids = {
+            (facet, norm): value_id
+            for value_id, facet, norm in conn.execute("SELECT value_id, facet, norm FROM facet_values")
+        }
+
+    def get(self, facet: str, label: str) -> int:
+        key = (facet, normalize_value(label))
+        value_id = self.ids.get(key)
+        if value_id is None:
+            cur = self.conn.execute(
+                "INSERT INTO facet_values(facet, label, norm) VALUES (?, ?, ?)", (facet, label, key[1])
+            )
+            value_id = self.ids[key] = cur.lastrowid
+        return value_id
+
+
+def _find_book(conn: sqlite3.Connection, row: Dict[str, str]) -> Optional[int]:
+    if row.get("link"):
+        found = conn.execute("SELECT book_id FROM books WHERE link = ?", (row["link"],)).fetchone()
+    else:
+        # Hand-added books may have no link: match them on title + author
+        found = conn.execute(
+            "SELECT book_id FROM books WHERE link IS NULL AND title = ? AND author = ?",
+            (row.get("title") or "", row.get("author") or ""),
+        ).fetchone()
+    return found[0] if found else None
+
+
+def _index_text(conn: sqlite3.Connection, book_id: int) -> None:
+    """(Re)write the full-text entry of one book from its current row and tropes."""
+    conn.execute("DELETE FROM books_fts WHERE rowid = ?", (book_id,))
+    conn.execute(
+        f"INSERT INTO books_fts(rowid, {', '.join(FTS_COLUMNS)}) "
+        "SELECT b.book_id, b.title, b.author, b.series_name, "
+        "COALESCE((SELECT group_concat(fv.label, ' ') FROM book_facets bf "
+        "JOIN facet_values fv ON fv.value_id = bf.value_id "
+        "WHERE bf.book_id = b.book_id AND fv.facet = 'tropes'), ''), "
+        "b.description FROM books b WHERE b.book_id = ?",
+        (book_id,),
+    )
+
+
+def upsert_rows(conn: sqlite3.Connection, rows: Iterable[Dict[str, str]], curated: bool = True) -> int:
+    """
+    Insert or update books keyed on link (title + author for link-less rows).
+
+    With curated=False only CRAWL_COLUMNS are written for existing books,
+    so a crawl never clobbers spice levels, facets or notes; new books get
+    all their columns (including the tagger's suggested facets).
+    Returns the number of rows written.
+    """
+    facet_ids = _FacetIds(conn)
+    extra_columns: Dict[str, None] = {}
+    written = 0
+    for row in rows:
+        values: Dict[str, Any] = {col: (row.get(col) or "") for col in BOOK_COLUMNS if col in row}
+        if "link" in values:
+            values["link"] = values["link"] or None
+        if "spice_level" in values:
+            values["spice_level"] = parse_spice(values["spice_level"])
+        extra = {
+            col: value for col, value in row.items()
+            if col and col not in BOOK_COLUMNS and col not in FACET_COLUMNS and value not in (None, "")
+        }
+        extra_columns.update(dict.fromkeys(c for c in row if c))
+
+        book_id = _find_book(conn, row)
+        is_new = book_id is None
+        if book_id is not None and not curated:
+            values = {col: v for col, v in values.items() if col in CRAWL_COLUMNS}
+        elif curated or extra:
+            values["extra"] = json.dumps(extra, ensure_ascii=False)
+
+        if book_id is None:
+            cols = list(values)
+            cur = conn.execute(
+                f"INSERT INTO books({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                [values[c] for c in cols],
+            )
+            book_id = cur.lastrowid
+        elif values:
+            conn.execute(
+                f"UPDATE books SET {', '.join(f'{c} = ?' for c in values)} WHERE book_id = ?",
+                [*values.values(), book_id],
+            )
+
+        if curated or is_new:
+            conn.execute("DELETE FROM book_facets WHERE book_id = ?", (book_id,))
+            pairs = []
+            for facet in FACET_COLUMNS:
+                for label in split_facet(row.get(facet, "")):
+                    pairs.append((facet_ids.get(facet, label), book_id))
+            # A value listed twice in one cell only counts once
+            pairs = list(dict.fromkeys(pairs))
+            conn.executemany(
+                "INSERT INTO book_facets(value_id, book_id, position) VALUES (?, ?, ?)",
+                [(value_id, b, pos) for pos, (value_id, b) in enumerate(pairs)],
+            )
+        _index_text(conn, book_id)
+        written += 1
+
+    _record_columns(conn, list(extra_columns))
+    return written
+
+
+def _read_csv_rows(csv_path: Path) -> Iterator[Dict[str, str]]:
+    with csv_path.open("r", encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def upsert_csv(csv_path: Path, db_path: Path = DB_PATH, curated: bool = True) -> int:
+    """Upsert every row of a catalogue CSV (master or raw crawl) in one transaction."""
+    with closing(connect(db_path)) as conn, conn:
+        return upsert_rows(conn, _read_csv_rows(csv_path), curated=curated)
+
+
+# ------------------- READING -------------------
+
+def _records(conn: sqlite3.Connection, book_ids: List[int]) -> List[Dict[str, Any]]:
+    """Rows for `book_ids` in the CSV layout (facets re-joined with '|'), in order."""
+    placeholders = ", ".join("?" * len(book_ids))
+    records: Dict[int, Dict[str, Any]] = {}
+    for row in conn.execute(
+        f"SELECT book_id, {', '.join(BOOK_COLUMNS)}, extra FROM books WHERE book_id IN ({placeholders})",
+        book_ids,
+    ):
+        record = dict(zip(BOOK_COLUMNS, row[1:-1]))
+        record["link"] = record["link"] or ""
+        record["spice_level"] = "" if record["spice_level"] is None else record["spice_level"]
+        record.update(json.loads(row[-1]))
+        for facet in FACET_COLUMNS:
+            record[facet] = []
+        records[row[0]] = record
+    for book_id, facet, label in conn.execute(
+        "SELECT bf.book_id, fv.facet, fv.label FROM book_facets bf "
+        "JOIN facet_values fv ON fv.value_id = bf.value_id "
+        f"WHERE bf.book_id IN ({placeholders}) ORDER BY bf.book_id, bf.position",
+        book_ids,
+    ):
+        records[book_id][facet].append(label)
+    for record in records.values():
+        for facet in FACET_COLUMNS:
+            record[facet] = "|".join(record[facet])
+    return [records[b] for b in book_ids if b in records]
+
+
+def export_csv(csv_path: Path, db_path: Path = DB_PATH) -> int:
+    """Write the database out in the master CSV layout (atomic replace)."""
+    written = 0
+    with closing(sqlite3.connect(db_path)) as conn, atomic_replace(csv_path) as tmp_path:
+        columns = get_columns(conn)
+        ids = [r[0] for r in conn.execute("SELECT book_id FROM books ORDER BY book_id")]
+        with tmp_path.open("w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(
+                f, fieldnames=columns, restval="", extrasaction="ignore", lineterminator="\n"
+            )
+            writer.writeheader()
+            for start in range(0, len(ids), BATCH_SIZE):
+                batch = _records(conn, ids[start:start + BATCH_SIZE])
+                writer.writerows(batch)
+                written += len(batch)
+    return written
+
+
+def fts_match_expression(text: str) -> str:
+    """Every query word must match: exactly, or as a prefix for longer words."""
+    terms = []
+    for token in tokenize(text):
+        quoted = '"' + token.replace('"', '""') + '"'
+        terms.append(quoted + "*" if len(token) >= PREFIX_MIN_LEN else quoted)
+    return " AND ".join(terms)
+
+
+class SqliteCatalogue:
+    """
+    Book Finder's query interface (search / rows / facet_counts, like
+    CatalogueEngine) answered by indexed SQL against the database.
+    Safe to share between Streamlit sessions: each thread gets its own
+    read-only connection.
+    """
+
+    def __init__(self, db_path: Path = DB_PATH, version: str = ""):
+        self.db_path = Path(db_path)
+        self.version = version or file_version(self.db_path)
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []   # every thread's, for close()
+        self._conns_lock = threading.Lock()
+        self.columns = get_columns(self.conn)
+        self.facet_counts: Dict[str, Counter] = self._facet_counts("SELECT book_id FROM books", [])
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(
+                f"file:{self.db_path.resolve()}?mode=ro", uri=True, check_same_thread=False
+            )
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close every thread's connection (e.g. once a newer version replaced this one)."""
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+            self._local = threading.local()
+        for conn in conns:
+            conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    def _match_sql(self, query: Query) -> Tuple[str, List[Any], bool]:
+        """SELECT of (book_id, score) for everything `query` matches."""
+        where: List[str] = []
+        params: List[Any] = []
+        match = fts_match_expression(query.text)
+        if match:
+            weights = ", ".join(str(FIELD_WEIGHTS[c]) for c in FTS_COLUMNS)
+            sql = (
+                f"SELECT b.book_id AS book_id, bm25(books_fts, {weights}) AS score "
+                "FROM books_fts JOIN books b ON b.book_id = books_fts.rowid"
+            )
+            where.append("books_fts MATCH ?")
+            params.append(match)
+        else:
+            sql = "SELECT b.book_id AS book_id, 0.0 AS score FROM books b"
+            if query.text.strip():
+                # Text with no indexable words matches nothing, as in CatalogueEngine
+                where.append("0")
+
+        if query.spice_include:
+            where.append(f"b.spice_level IN ({', '.join('?' * len(query.spice_include))})")
+            params.extend(query.spice_include)
+        if query.spice_exclude:
+            where.append(
+                f"(b.spice_level IS NULL OR b.spice_level NOT IN ({', '.join('?' * len(query.spice_exclude))}))"
+            )
+            params.extend(query.spice_exclude)
+
+        for facet in FACET_COLUMNS:
+            for selected, op in ((query.include.get(facet, ()), "IN"), (query.exclude.get(facet, ()), "NOT IN")):
+                if not selected:
+                    continue
+                # Same semantics as the in-memory index: substring of a normalized value
+                contains = " OR ".join("instr(fv.norm, ?) > 0" for _ in selected)
+                where.append(
+                    f"b.book_id {op} (SELECT bf.book_id FROM book_facets bf "
+                    "JOIN facet_values fv ON fv.value_id = bf.value_id "
+                    f"WHERE fv.facet = ? AND ({contains}))"
+                )
+                params.append(facet)
+                params.extend(normalize_value(v) for v in selected)
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return sql, params, bool(match)
+
+    def _facet_counts(self, match_sql: str, params: List[Any]) -> Dict[str, Counter]:
+        counts: Dict[str, Counter] = {"spice_level": Counter()}
+        for facet in FACET_COLUMNS:
+            counts[facet] = Counter()
+        for level, n in self.conn.execute(
+            f"WITH m AS ({match_sql}) SELECT b.spice_level, COUNT(*) FROM m "
+            "JOIN books b ON b.book_id = m.book_id "
+            "WHERE b.spice_level IS NOT NULL GROUP BY b.spice_level",
+            params,
+        ):
+            counts["spice_level"][int(level)] = n
+        for facet, label, n in self.conn.execute(
+            f"WITH m AS ({match_sql}) SELECT fv.facet, fv.label, COUNT(*) FROM m "
+            "JOIN book_facets bf ON bf.book_id = m.book_id "
+            "JOIN facet_values fv ON fv.value_id = bf.value_id GROUP BY fv.value_id",
+            params,
+        ):
+            counts[facet][label] = n
+        return counts
+
+    def search(self, query: Query) -> SearchResult:
+        sql, params, ranked = self._match_sql(query)
+        order = "score, book_id" if ranked else "book_id"
+        row_ids = np.fromiter(
+            (r[0] for r in self.conn.execute(f"SELECT book_id FROM ({sql}) ORDER BY {order}", params)),
+            dtype=np.int64,
+        )
+        return SearchResult(
+            row_ids=row_ids if query.limit is None else row_ids[:query.limit],
+            total=len(row_ids),
+            facets=self._facet_counts(sql, params),
+        )
+
+    def rows(self, row_ids: np.ndarray) -> pd.DataFrame:
+        """Materialise just the given books (by book_id), in order."""
+        ids = [int(i) for i in row_ids]
+        records = _records(self.conn, ids) if ids else []
+        return pd.DataFrame(records, columns=self.columns)
+
+    def cover_urls(self, row_ids: np.ndarray) -> List[str]:
+        """cover_url of the given books, in order (nothing else is read)."""
+        ids = [int(i) for i in row_ids]
+        if not ids:
+            return []
+        urls = dict(self.conn.execute(
+            f"SELECT book_id, cover_url FROM books WHERE book_id IN ({', '.join('?' * len(ids))})", ids
+        ))
+        return [urls.get(book_id) or "" for book_id in ids]
+
+
+# ------------------- CLI -------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="SQLite catalogue backend")
+    parser.add_argument("command", choices=["import", "export"],
+                        help="import: upsert the CSV into the database; export: write it back out")
+    parser.add_argument("csv", nargs="?", type=Path, default=CSV_PATH)
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        n = upsert_csv(args.csv, args.db, curated=True)
+        print(f"Upserted {n} books from {args.csv.name} into {args.db.name}")
+    else:
+        n = export_csv(args.csv, args.db)
+        print(f"Exported {n} books from {args.db.name} to {args.csv.name}")
+
+
+if __name__ == "__main__":
+    main()
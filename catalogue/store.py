@@ -0,0 +1,164 @@
+"""
+catalogue/store.py
+
+Loading and saving the catalogue.
+
+data/romance_catalogue.csv stays the human-editable source of truth.
+Alongside it the ingester writes data/romance_catalogue.parquet, a columnar
+copy with the pipe-separated facet columns stored as categoricals. The
+Parquet file records the SHA-1 of the CSV it was built from, and
+load_catalogue_frame() only uses it while that still matches, so a
+hand-edited CSV is never shadowed by a stale artifact.
+
+Parquet support needs pyarrow (installed with Streamlit); without it
+everything falls back to the CSV.
+"""
+
+import hashlib
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+import pandas as pd
+
+from catalogue.index import FACET_COLUMNS
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CSV_PATH = BASE_DIR / "data" / "romance_catalogue.csv"
+
+SOURCE_HASH_KEY = b"sizzl_source_sha1"
+
+# Always text, even when every cell is blank (pandas would read those as float NaN)
+TEXT_COLUMNS = [
+    "title", "author", "series_name", "description", "link", "cover_url", "notes", "subjects", "auto_tagged",
+]
+
+
+def columnar_path_for(csv_path: Path) -> Path:
+    return csv_path.with_suffix(".parquet")
+
+
+def file_sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_version(path: Path) -> str:
+    """Cheap version key for a file (mtime + size); changes whenever it is rewritten."""
+    stat = path.stat()
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+@contextmanager
+def atomic_replace(path: Path) -> Iterator[Path]:
+    """
+    Yields a temp path next to `path`; once the block is done it is renamed
+    over `path`, so readers never see half a file. Removed if the block fails.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def normalise_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Blank out NaN in text columns and store facet columns as categoricals."""
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            if "" not in df[col].cat.categories:
+                df[col] = df[col].cat.add_categories([""])
+            df[col] = df[col].fillna("")
+        elif df[col].dtype == object or pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].fillna("")
+        elif col in TEXT_COLUMNS:
+            df[col] = df[col].fillna("").astype(str)
+    for col in FACET_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].fillna("").astype(str).astype("category")
+    return df
+
+
+def read_csv_frame(csv_path: Path = CSV_PATH, skip: Sequence[str] = ()) -> pd.DataFrame:
+    if not skip:
+        return normalise_frame(pd.read_csv(csv_path))
+    return normalise_frame(pd.read_csv(csv_path, usecols=lambda c: c not in skip))
+
+
+def _columnar_source_hash(parquet_path: Path) -> Optional[str]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    try:
+        metadata = pq.read_schema(parquet_path).metadata or {}
+    except Exception:
+        return None
+    value = metadata.get(SOURCE_HASH_KEY)
+    return value.decode() if value else None
+
+
+def columnar_is_fresh(csv_path: Path = CSV_PATH, source_hash: Optional[str] = None) -> bool:
+    """True if the Parquet copy exists and was built from the current CSV."""
+    parquet_path = columnar_path_for(csv_path)
+    if not parquet_path.exists() or not csv_path.exists():
+        return False
+    recorded = _columnar_source_hash(parquet_path)
+    return recorded is not None and recorded == (source_hash or file_sha1(csv_path))
+
+
+def write_columnar(csv_path: Path = CSV_PATH) -> Optional[Path]:
+    """
+    (Re)build the Parquet copy of csv_path if it is missing or stale.
+    Returns the Parquet path, or None when pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed; skipping columnar catalogue.")
+        return None
+
+    parquet_path = columnar_path_for(csv_path)
+    source_hash = file_sha1(csv_path)
+    if columnar_is_fresh(csv_path, source_hash):
+        print(f"{parquet_path.name} already up to date.")
+        return parquet_path
+
+    df = read_csv_frame(csv_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_HASH_KEY] = source_hash.encode()
+    table = table.replace_schema_metadata(metadata)
+
+    with atomic_replace(parquet_path) as tmp_path:
+        pq.write_table(table, tmp_path, compression="zstd")
+    print(f"Wrote columnar catalogue {parquet_path.name} ({len(df)} rows)")
+    return parquet_path
+
+
+def load_catalogue_frame(
+    csv_path: Path = CSV_PATH, skip: Sequence[str] = (), source_hash: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Load the catalogue, preferring the Parquet copy when it is fresh.
+    Columns in `skip` are never read (e.g. descriptions kept in their own store).
+    """
+    if columnar_is_fresh(csv_path, source_hash):
+        try:
+            parquet_path = columnar_path_for(csv_path)
+            columns = None
+            if skip:
+                import pyarrow.parquet as pq
+                columns = [c for c in pq.read_schema(parquet_path).names if c not in skip]
+            return normalise_frame(pd.read_parquet(parquet_path, columns=columns))
+        except Exception:
+            pass
+    return read_csv_frame(csv_path, skip)
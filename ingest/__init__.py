@@ -0,0 +1,6 @@
+"""
+Open Library ingestion: the catalogue update pipeline (ingest/pipeline.py,
+`python -m ingest`) and the pieces it is built from. The
+update_romance_catalogue.py and update_openlibrary_romance.py scripts are
+thin wrappers around it.
+"""
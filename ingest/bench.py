@@ -0,0 +1,472 @@
+"""
+ingest/bench.py
+
+Benchmarks and checks for the ingester against a local stub of Open
+Library, so they can be rerun offline.
+
+    python -m ingest.bench            # 60 works
+    python -m ingest.bench 200        # custom size
+
+StubOpenLibrary serves search pages, /works/<key>.json, batched
+key:(...) searches and cover JPEGs on 127.0.0.1 with a fixed latency,
+and logs when each request arrived. stub_openlibrary() points the shared
+client (ingest/client.py) at it through a transport adapter and gives
+the run a fresh response cache, so everything else is the code the
+weekly job runs.
+A crash can be injected at a given search page to exercise the
+checkpoint resume (ingest/checkpoint.py), and failures at given pages to
+exercise the shard retry (ingest/shards.py). The cover check needs
+Pillow, like the cover step itself.
+"""
+
+import csv
+import io
+import json
+import re
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import HTTPAdapter
+
+import ingest.client
+import ingest.http_cache
+from catalogue.covers import CoverCache
+from ingest.checkpoint import CrawlCheckpoint
+from ingest.client import AdaptivePacer, OpenLibraryClient
+from ingest.covers import cache_covers
+from ingest.enrich import DESCRIPTION_WORKERS, Enricher, work_key_from_link
+from ingest.http_cache import ResponseCache
+from ingest.pipeline import Pipeline, PipelineConfig
+from ingest.search import crawl_shards
+from ingest.shards import MAX_PAGE_FAILURES
+
+
+OPEN_LIBRARY_HOSTS = ["https://openlibrary.org", "https://covers.openlibrary.org"]
+
+# Open Library answers work requests in a few hundred ms; scaled down here,
+# with the pacing limit scaled to match so it still binds.
+STUB_LATENCY = 0.1      # seconds per request
+BENCH_RATE = 40.0       # requests per second allowed by the pacer
+
+# Pipeline runs: short pages so the target takes several crawl rounds
+PIPELINE_LATENCY = 0.005
+PIPELINE_RATE = 500.0
+SEARCH_PAGES = 4        # pages per query before it runs out
+DOCS_PER_PAGE = 20
+SHARED_EVERY = 3        # every third doc is the same work in every query
+PIPELINE_TARGET = 400
+
+COVER_SIZE = (600, 900)   # px, about what Open Library's -L covers are
+COVER_RE = re.compile(r"^/b/id/(\d+)-L\.jpg$")
+
+
+class SimulatedCrash(BaseException):
+    """Raised in place of a request, like a runner killed mid-crawl (not caught as an Exception)."""
+
+
+# ---- Stub server ----
+
+class StubOpenLibrary:
+    """Local stand-in for Open Library; `log` holds (arrival time, path, query) per request."""
+
+    def __init__(self, latency: float = STUB_LATENCY):
+        self.latency = latency
+        self.log: List[Tuple[float, str, Dict[str, str]]] = []
+        self.crash_on: Optional[Tuple[str, int]] = None   # (text in the query, page)
+        self.fail_on: Dict[Tuple[str, int], int] = {}      # (query, page) -> 400s left to send
+        self.covers: Dict[int, bytes] = {}                  # cover id -> JPEG served
+        self.missing_covers: Set[int] = set()               # cover ids answered with a 404
+        self._lock = threading.Lock()
+        handler = type("Handler", (_StubHandler,), {"stub": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "StubOpenLibrary":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def work_description(work_key: str) -> str:
+        return f"Stub description of {work_key}."
+
+    def request_times(self, prefix: str) -> List[float]:
+        with self._lock:
+            return [t for t, path, _ in self.log if path.startswith(prefix)]
+
+    def search_pages(self) -> Set[Tuple[str, int]]:
+        """(query, page) of every crawl search request seen."""
+        with self._lock:
+            return {
+                (params["q"], int(params.get("page", 1)))
+                for _, path, params in self.log
+                if path == "/search.json" and not params.get("q", "").startswith("key:(")
+            }
+
+    def should_crash(self, path: str, params: Dict[str, str]) -> bool:
+        if self.crash_on is None or path != "/search.json":
+            return False
+        text, page = self.crash_on
+        return text in params.get("q", "") and int(params.get("page", 1)) == page
+
+    def search_docs(self, query: str, page: int) -> List[Dict[str, Any]]:
+        """Deterministic docs for one page; shared works show up in every query."""
+        if page > SEARCH_PAGES:
+            return []
+        shard = zlib.crc32(query.encode())
+        docs = []
+        for i in range(DOCS_PER_PAGE):
+            work = f"OL{page}S{i}W" if i % SHARED_EVERY == 0 else f"OL{shard}P{page}N{i}W"
+            docs.append({
+                "key": f"/works/{work}",
+                "title": f"Stub Romance {work}",
+                "author_name": ["Stub Author"],
+                "subject": ["Romance"],
+                "cover_i": zlib.crc32(work.encode()) % 1_000_000,
+            })
+        return docs
+
+    def cover(self, cover_id: int) -> bytes:
+        """A full-size noise JPEG, different for every cover id (so thumbnails don't share files)."""
+        from PIL import Image
+
+        with self._lock:
+            if cover_id not in self.covers:
+                out = io.BytesIO()
+                Image.effect_noise(COVER_SIZE, 48).convert("RGB").save(out, format="JPEG", quality=90)
+                self.covers[cover_id] = out.getvalue()
+            return self.covers[cover_id]
+
+    def clear_log(self) -> None:
+        with self._lock:
+            self.log.clear()
+
+    def respond(self, path: str, params: Dict[str, str]) -> Tuple[int, str, bytes]:
+        """(status, content type, body) for one GET."""
+        with self._lock:
+            self.log.append((time.monotonic(), path, params))
+        time.sleep(self.latency)
+
+        page_key = (params.get("q", ""), int(params.get("page", 1)))
+        with self._lock:
+            if self.fail_on.get(page_key, 0) > 0 and path == "/search.json":
+                self.fail_on[page_key] -= 1
+                return 400, "application/json", b"{}"   # not retried by the client
+
+        if path.startswith("/works/") and path.endswith(".json"):
+            key = path[:-len(".json")]
+            body = {"key": key, "description": {"value": self.work_description(key)}, "subjects": ["Romance"]}
+        elif path == "/search.json" and params.get("q", "").startswith("key:("):
+            keys = re.findall(r'"([^"]+)"', params["q"])
+            body = {"docs": [{"key": key, "subject": ["Romance"]} for key in keys]}
+        elif path == "/search.json":
+            body = {"docs": self.search_docs(params.get("q", ""), int(params.get("page", 1)))}
+        elif COVER_RE.match(path):
+            cover_id = int(COVER_RE.match(path).group(1))
+            if cover_id in self.missing_covers:
+                return 404, "text/html", b"not found"
+            return 200, "image/jpeg", self.cover(cover_id)
+        else:
+            return 404, "application/json", b"{}"
+        return 200, "application/json", json.dumps(body).encode()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real client expects
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    stub: StubOpenLibrary
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        status, content_type, body = self.stub.respond(url.path, params)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class StubTransport(HTTPAdapter):
+    """Sends requests for Open Library hosts to the stub instead."""
+
+    def __init__(self, stub: StubOpenLibrary):
+        super().__init__()
+        self.stub = stub
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        if self.stub.should_crash(url.path, {k: v[0] for k, v in parse_qs(url.query).items()}):
+            raise SimulatedCrash(f"crashed fetching {url.path}?{url.query}")
+        request.url = self.stub.base_url + url.path + (f"?{url.query}" if url.query else "")
+        return super().send(request, **kwargs)
+
+
+@contextmanager
+def stub_openlibrary(stub: StubOpenLibrary, cache_path: Path, max_rate: float = BENCH_RATE) -> Iterator[OpenLibraryClient]:
+    """Shared client and response cache pointed at the stub for the duration of the block."""
+    client = OpenLibraryClient(pacer=AdaptivePacer(max_rate=max_rate, min_rate=max_rate / 10))
+    transport = StubTransport(stub)
+    for host in OPEN_LIBRARY_HOSTS:
+        client.session.mount(host, transport)
+
+    saved = ingest.client._CLIENT, ingest.http_cache._CACHE
+    ingest.client._CLIENT = client
+    ingest.http_cache._CACHE = ResponseCache(cache_path)
+    try:
+        yield client
+    finally:
+        ingest.client._CLIENT, ingest.http_cache._CACHE = saved
+        client.session.close()
+
+
+def pipeline_config(tmp: Path, target: int = PIPELINE_TARGET) -> PipelineConfig:
+    """Raw CSV only (no master), with a checkpoint; nothing outside `tmp` is touched."""
+    return PipelineConfig(
+        target_count=target,
+        master_path=None,
+        raw_path=tmp / "raw.csv",
+        checkpoint_path=tmp / "checkpoint.json",
+        db_path=tmp / "catalogue.sqlite",
+        tag=False,
+        covers=False,
+    )
+
+
+def read_rows(path: Path) -> List[Dict[str, str]]:
+    with path.open("r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def peak_rate(times: List[float], window: float = 1.0) -> int:
+    """Most requests that arrived within any `window` seconds."""
+    times = sorted(times)
+    peak, first = 0, 0
+    for last, t in enumerate(times):
+        while t - times[first] >= window:
+            first += 1
+        peak = max(peak, last - first + 1)
+    return peak
+
+
+# ---- Benchmarks ----
+
+def bench_descriptions(stub: StubOpenLibrary, tmp: Path, n_rows: int) -> None:
+    """
+    Serial vs concurrent description fetch (Enricher, stage 1). Every row
+    must get its own work's description back, and the requests the stub
+    saw must stay within the pacer's limit.
+    """
+    rows = [
+        {"id": i, "link": f"https://openlibrary.org/works/OL{i}W", "description": "", "subjects": ""}
+        for i in range(n_rows)
+    ]
+    stub.latency = STUB_LATENCY
+    elapsed: Dict[int, float] = {}
+    for workers in (1, DESCRIPTION_WORKERS):
+        batch = [dict(row) for row in rows]
+        stub.clear_log()
+        with stub_openlibrary(stub, tmp / f"descriptions_{workers}.sqlite"):
+            start = time.perf_counter()
+            Enricher(workers=workers).enrich(batch)
+            elapsed[workers] = time.perf_counter() - start
+
+        assert all(
+            row["description"] == stub.work_description(work_key_from_link(row["link"])) for row in batch
+        ), "descriptions landed on the wrong rows"
+        times = stub.request_times("/works/")
+        assert len(times) == n_rows, f"{len(times)} work requests for {n_rows} works"
+        peak = peak_rate(times)
+        # A second can hold rate + 1 paced requests, plus one of arrival jitter
+        assert peak <= BENCH_RATE + 2, f"{peak} requests in one second, limit {BENCH_RATE:g}/s"
+        print(f"descriptions, {workers} worker{'s' if workers > 1 else ' '}: {elapsed[workers]:6.2f} s "
+              f"({n_rows} works, peak {peak} req/s, limit {BENCH_RATE:g})")
+    print(f"descriptions speedup:  {elapsed[1] / elapsed[DESCRIPTION_WORKERS]:6.1f}x")
+
+
+def bench_resume(stub: StubOpenLibrary, tmp: Path, target: int = PIPELINE_TARGET) -> None:
+    """
+    Crash the crawl in its second round, leave half a row at the end of the
+    raw CSV (a write the crash cut short), then run again. The resumed run
+    must cut the tail off, skip every checkpointed page and end with
+    `target` rows, ids 1..target and no link twice.
+    """
+    stub.latency = PIPELINE_LATENCY
+    config = pipeline_config(tmp, target)
+    crash_page = 2
+    stub.crash_on = ("1970", crash_page)
+    stub.clear_log()
+    start = time.perf_counter()
+    try:
+        with stub_openlibrary(stub, tmp / "resume_1.sqlite", PIPELINE_RATE), redirect_stdout(io.StringIO()):
+            Pipeline(config).run()
+        raise AssertionError("the injected crash never happened")
+    except SimulatedCrash:
+        pass
+    stub.crash_on = None
+    first_run = time.perf_counter() - start
+    fetched = stub.search_pages()
+
+    collected = len(read_rows(config.raw_path))
+    with config.raw_path.open("a", encoding="utf-8") as f:
+        f.write("999999,Torn Ro")
+
+    stub.clear_log()
+    start = time.perf_counter()
+    with stub_openlibrary(stub, tmp / "resume_2.sqlite", PIPELINE_RATE), redirect_stdout(io.StringIO()):
+        Pipeline(config).run()
+    second_run = time.perf_counter() - start
+
+    rows = read_rows(config.raw_path)
+    ids = [int(row["id"]) for row in rows]
+    links = [row["link"] for row in rows]
+    assert ids == list(range(1, target + 1)), "row ids are not 1..target in order"
+    assert len(set(links)) == len(links), "a link was written twice"
+    assert all(row["description"] for row in rows), "rows left without a description"
+    assert not config.checkpoint_path.exists(), "checkpoint kept after a complete run"
+    # Rounds before the crash were checkpointed; only the crashed one goes out again
+    refetched = {(q, page) for q, page in stub.search_pages() & fetched if page < crash_page}
+    assert not refetched, f"checkpointed pages fetched again: {sorted(refetched)}"
+    print(f"resume:               {first_run:6.2f} s to the crash ({collected} rows checkpointed), "
+          f"{second_run:6.2f} s to finish ({len(rows)} rows, no checkpointed page refetched)")
+
+
+def bench_shards(stub: StubOpenLibrary, tmp: Path) -> None:
+    """
+    Run the pipeline until every shard is crawled to the end. Works shared
+    between shards must be kept once; a page that fails fewer than
+    MAX_PAGE_FAILURES times is retried in the same run, one that fails that
+    often pauses its shard with the cursor still on it, and the next run()
+    fetches it, resuming the raw CSV the paused run left untouched.
+    """
+    stub.latency = PIPELINE_LATENCY
+    shards = crawl_shards()
+    docs = [doc for shard in shards for page in range(1, SEARCH_PAGES + 1) for doc in stub.search_docs(shard.query, page)]
+    expected = {doc["key"] for doc in docs}
+    retried, paused = shards[0], shards[-1]
+    stub.fail_on = {(retried.query, 2): MAX_PAGE_FAILURES - 1, (paused.query, 3): MAX_PAGE_FAILURES}
+
+    config = pipeline_config(tmp / "shards", target=len(docs))
+    config.raw_path.parent.mkdir()
+    pipeline = Pipeline(config)
+    with stub_openlibrary(stub, tmp / "shards_1.sqlite", PIPELINE_RATE), redirect_stdout(io.StringIO()):
+        pipeline.run()
+    checkpoint = CrawlCheckpoint.load(config.checkpoint_path)
+    assert checkpoint is not None and not checkpoint.complete and retried.name in checkpoint.finished
+    assert checkpoint.cursors[paused.name] == 3, f"{paused.name} paused at page {checkpoint.cursors[paused.name]}"
+    assert config.raw_path.stat().st_size == checkpoint.raw_bytes, "the paused run rewrote the raw CSV"
+    first_rows = checkpoint.rows
+    duplicates = pipeline.stats.counters["filter"]["duplicates"]
+
+    pipeline = Pipeline(config)
+    with stub_openlibrary(stub, tmp / "shards_2.sqlite", PIPELINE_RATE), redirect_stdout(io.StringIO()):
+        pipeline.run()
+    assert not config.checkpoint_path.exists(), "the paused shard did not finish on the next run"
+
+    rows = read_rows(config.raw_path)
+    assert all(row["description"] for row in rows), "rows left without a description"
+    links = [row["link"] for row in rows]
+    keys = {link[len("https://openlibrary.org"):] for link in links}
+    assert len(links) == len(keys), "a work was written twice"
+    assert keys == expected, f"{len(expected - keys)} works missing"
+    duplicates += pipeline.stats.counters["filter"]["duplicates"]
+    print(f"shards:               {len(shards)} shards, {len(docs)} docs -> {len(links)} works, "
+          f"{duplicates} cross-shard duplicates dropped ({first_rows} rows before {paused.name} was paused)")
+
+
+def bench_covers(stub: StubOpenLibrary, tmp: Path) -> None:
+    """
+    Download, no-op rerun, Book Finder views, then a smaller cache with a
+    new catalogue. A rerun must not download or rewrite the manifest, views
+    go to usage.json only; at the cap covers the catalogue no longer
+    references are evicted, referenced ones never are, downloads stop, and
+    further runs change nothing. Covers that fail are not retried next run.
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("covers:               skipped (Pillow not installed)")
+        return
+    stub.latency = PIPELINE_LATENCY
+    root = tmp / "covers"
+    cover_ids = range(1, 13)
+    urls = [f"https://covers.openlibrary.org/b/id/{i}-L.jpg" for i in cover_ids]
+    old, new = urls[:8], urls[4:]
+
+    with stub_openlibrary(stub, tmp / "covers.sqlite", PIPELINE_RATE), redirect_stdout(io.StringIO()):
+        first = cache_covers(old, CoverCache(root))
+        manifest = (root / "manifest.json").read_bytes()
+        stub.clear_log()
+        again = cache_covers(old, CoverCache(root))
+    assert first["cached"] == len(old), f"{first['cached']} of {len(old)} covers cached"
+    assert again["cached"] == 0 and not stub.request_times("/b/"), "a cached cover was downloaded again"
+    assert (root / "manifest.json").read_bytes() == manifest, "a no-op run rewrote the manifest"
+    assert all(CoverCache(root).lookup(url) is not None for url in old), "a cached cover has no thumbnail"
+    remote_bytes = sum(len(stub.cover(i)) for i in cover_ids[:len(old)])
+
+    # Book Finder shows two of the covers; only usage.json changes
+    viewer = CoverCache(root)
+    thumb_bytes = viewer.total_bytes()
+    for url in old[4:6]:
+        viewer.lookup(url)
+    viewer.save_usage()
+    assert (root / "manifest.json").read_bytes() == manifest, "Book Finder rewrote the manifest"
+
+    # The catalogue drops old[:4] and gains four covers; the cap holds about five
+    cap = thumb_bytes * 5 // len(old)
+    with stub_openlibrary(stub, tmp / "covers.sqlite", PIPELINE_RATE), redirect_stdout(io.StringIO()):
+        shrunk = cache_covers(new, CoverCache(root, max_bytes=cap), workers=2)
+        manifest = (root / "manifest.json").read_bytes()
+        stub.clear_log()
+        steady = [cache_covers(new, CoverCache(root, max_bytes=cap), workers=2) for _ in range(2)]
+    kept = set(CoverCache(root).entries)
+    stale = set(urls) - set(new)
+    assert not kept & stale, "a cover no longer in the catalogue was kept over the cap"
+    assert kept >= set(old[4:]), "a referenced cover was evicted"
+    assert shrunk["remote"] > 0, "downloads did not stop at the cap"
+    assert all(run["cached"] == run["evicted"] == 0 for run in steady) and not stub.request_times("/b/"), \
+        "a full cache keeps evicting and downloading referenced covers"
+    assert (root / "manifest.json").read_bytes() == manifest, "a full cache rewrote the manifest"
+
+    # Covers that never load are skipped after one try, so the rest get the budget
+    broken = [f"https://covers.openlibrary.org/b/id/{i}-L.jpg" for i in range(101, 104)]
+    stub.missing_covers = {101, 102, 103}
+    runs = []
+    with stub_openlibrary(stub, tmp / "covers.sqlite", PIPELINE_RATE), redirect_stdout(io.StringIO()):
+        for _ in range(3):
+            runs.append(cache_covers(broken + urls[:3], CoverCache(tmp / "covers_failed"), max_new=3))
+    assert [run["failed"] for run in runs] == [3, 0, 0], "failed covers were asked for again"
+    assert [run["cached"] for run in runs] == [0, 3, 0], "failed covers kept the others from being cached"
+
+    print(f"covers:               {remote_bytes / len(old) / 1e3:6.1f} KB remote -> {thumb_bytes / len(old) / 1e3:5.1f} KB thumbnail, "
+          f"no-op rerun 0 downloads; at the cap {shrunk['evicted']} unreferenced evicted, "
+          f"{shrunk['remote']} left remote, reruns stable; failures not retried")
+
+
+def main(argv: List[str]) -> None:
+    n_rows = int(argv[0]) if argv else 60
+    with tempfile.TemporaryDirectory() as tmp, StubOpenLibrary() as stub:
+        print(f"Stub Open Library on {stub.base_url} ({stub.latency * 1000:.0f} ms per request)")
+        bench_descriptions(stub, Path(tmp), n_rows)
+        bench_resume(stub, Path(tmp))
+        bench_shards(stub, Path(tmp))
+        bench_covers(stub, Path(tmp))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,116 @@
+"""
+ingest/checkpoint.py
+
+Crash-safe progress for the weekly crawl.
+
+Accepted rows are appended to the raw CSV as each search page is done
+(flushed + fsynced), then a small JSON checkpoint records each
+search shard's page cursor, the row counter and the CSV's length. If the run dies, the next one
+picks up the same raw file at the saved page instead of starting the
+crawl from scratch.
+
+On resume the CSV is cut back to the checkpointed length, so rows from a
+round that never got its checkpoint (possibly half-written) are dropped
+and those pages are simply fetched again.
+"""
+
+import csv
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from catalogue.store import atomic_replace
+from ingest.merge import RAW_COLUMNS
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CHECKPOINT_PATH = BASE_DIR / ".cache" / "crawl_checkpoint.json"
+
+# Search results drift as Open Library adds books; a cursor older than
+# this no longer points at the same docs, so start over instead.
+MAX_CHECKPOINT_AGE = 2 * 24 * 3600
+
+
+@dataclass
+class CrawlCheckpoint:
+    raw_path: str
+    cursors: Dict[str, int] = field(default_factory=dict)  # shard -> next search page
+    finished: List[str] = field(default_factory=list)      # shards out of results
+    row_id: int = 1              # next row id to hand out
+    rows: int = 0                # rows in the raw CSV
+    raw_bytes: int = 0           # raw CSV length after the last checkpointed page
+    skipped_known: int = 0
+    complete: bool = False       # crawl finished
+    enriched: bool = False       # enrichment stage finished; only the merge is left
+    started_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def load(cls, path: Path = CHECKPOINT_PATH) -> Optional["CrawlCheckpoint"]:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return cls(**data)
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def is_stale(self, max_age: float = MAX_CHECKPOINT_AGE) -> bool:
+        return time.time() - self.updated_at > max_age
+
+    def save(self, path: Path = CHECKPOINT_PATH) -> None:
+        """Atomic write: a crash leaves either the old or the new checkpoint."""
+        self.updated_at = time.time()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_replace(path) as tmp_path:
+            tmp_path.write_text(json.dumps(asdict(self), indent=2), encoding="utf-8")
+
+    @staticmethod
+    def clear(path: Path = CHECKPOINT_PATH) -> None:
+        path.unlink(missing_ok=True)
+
+
+class RawCsvWriter:
+    """Appends rows to the raw CSV and makes each batch durable."""
+
+    def __init__(self, path: Path, fieldnames: List[str] = RAW_COLUMNS, resume_at: int = 0):
+        """resume_at: keep the first `resume_at` bytes and append after them (0 = start over)."""
+        self.path = path
+        self.fieldnames = fieldnames
+        fresh = resume_at <= 0 or not path.exists()
+        if not fresh:
+            os.truncate(path, min(resume_at, path.stat().st_size))
+        self._file = path.open("w" if fresh else "a", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction="ignore")
+        if fresh:
+            self._writer.writeheader()
+        self.size = self.flush()
+
+    def write_rows(self, rows: List[Dict[str, Any]]) -> int:
+        """Append `rows`; returns the file length once they are on disk."""
+        self._writer.writerows(rows)
+        self.size = self.flush()
+        return self.size
+
+    def flush(self) -> int:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return os.fstat(self._file.fileno()).st_size
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "RawCsvWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_raw_links(path: Path) -> List[str]:
+    """Links already collected in a (possibly partial) raw CSV."""
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8", newline="") as f:
+        return [row.get("link") or "" for row in csv.DictReader(f)]
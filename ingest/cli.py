@@ -0,0 +1,66 @@
+"""
+ingest/cli.py
+
+Command line for the catalogue update pipeline (ingest/pipeline.py):
+
+    python -m ingest                      # weekly update of data/romance_catalogue.csv
+    python -m ingest --target 500 --dry-run
+    python -m ingest --no-merge --raw data/romance_openlibrary.csv
+"""
+
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+from ingest.pipeline import Pipeline, PipelineConfig, StageStats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = PipelineConfig()
+    parser = argparse.ArgumentParser(
+        prog="python -m ingest",
+        description="Crawl Open Library for romance books and merge the new ones into the catalogue.",
+    )
+    parser.add_argument("-n", "--target", type=int, default=defaults.target_count,
+                        help="new rows to collect (default %(default)s)")
+    parser.add_argument("--shard-workers", type=int, default=defaults.shard_workers,
+                        help="search shards fetched concurrently (default %(default)s)")
+    parser.add_argument("--description-workers", type=int, default=defaults.description_workers,
+                        help="concurrent work lookups during enrichment (default %(default)s)")
+    parser.add_argument("--master", type=Path, default=defaults.master_path,
+                        help="master catalogue CSV (default %(default)s)")
+    parser.add_argument("--raw", type=Path, default=None,
+                        help="raw CSV to write (default: date-stamped next to the master)")
+    parser.add_argument("--db", type=Path, default=defaults.db_path,
+                        help="SQLite catalogue to upsert into, if it exists (default %(default)s)")
+    parser.add_argument("--checkpoint", type=Path, default=defaults.checkpoint_path,
+                        help="crawl checkpoint file (default %(default)s)")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="don't resume or save progress")
+    parser.add_argument("--no-merge", action="store_true",
+                        help="only write the raw CSV; no master, SQLite, Parquet or covers")
+    parser.add_argument("--no-tag", action="store_true", help="skip the tag suggestion stage")
+    parser.add_argument("--no-covers", action="store_true", help="skip cover thumbnails")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="crawl, enrich and tag into a temp file (or --raw); no checkpoint, master or DB changes")
+    return parser
+
+
+def config_from_args(args: argparse.Namespace) -> PipelineConfig:
+    return PipelineConfig(
+        target_count=args.target,
+        shard_workers=args.shard_workers,
+        description_workers=args.description_workers,
+        master_path=None if args.no_merge else args.master,
+        raw_path=args.raw,
+        checkpoint_path=None if args.no_checkpoint else args.checkpoint,
+        db_path=args.db,
+        tag=not args.no_tag,
+        covers=not args.no_covers,
+        dry_run=args.dry_run,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> StageStats:
+    args = build_parser().parse_args(argv)
+    return Pipeline(config_from_args(args)).run()
@@ -0,0 +1,188 @@
+"""
+ingest/client.py
+
+Shared HTTP client for Open Library.
+
+- One requests.Session with keep-alive connection pooling, so repeated
+  calls reuse TCP/TLS connections instead of opening new ones.
+- Retries 429/5xx and connection errors with exponential backoff + jitter,
+  honouring Retry-After when the server sends it.
+- Per-endpoint (connect, read) timeouts.
+- Adaptive pacing: a global request interval that widens when Open Library
+  pushes back and slowly tightens again while requests succeed. This
+  replaces the old fixed sleep between search pages.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+USER_AGENT = "SizzlClub catalogue updater (https://sizzlclub.streamlit.app/)"
+
+# (connect, read) timeouts in seconds
+ENDPOINT_TIMEOUTS = {
+    "search": (5, 30),
+    "works": (5, 15),
+    "covers": (5, 30),
+    "default": (5, 20),
+}
+
+POOL_SIZE = 16           # keep-alive connections per host
+MAX_RETRIES = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0       # seconds, doubled per attempt
+BACKOFF_CAP = 60.0
+
+MAX_REQUESTS_PER_SECOND = 3.0
+MIN_REQUESTS_PER_SECOND = 0.2
+
+
+class AdaptivePacer:
+    """
+    Thread-safe global pacing. Calls to wait() are spaced 1 / rate seconds
+    apart across all threads. The rate is halved when the server throttles
+    us and creeps back up (additively) on every success.
+    """
+
+    def __init__(
+        self,
+        max_rate: float = MAX_REQUESTS_PER_SECOND,
+        min_rate: float = MIN_REQUESTS_PER_SECOND,
+    ):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.rate = max_rate
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 0.05 * self.max_rate)
+
+    def on_throttle(self, pause: float = 0.0) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            # Nobody goes out until the pause is over.
+            self._next_slot = max(self._next_slot, time.monotonic() + pause)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given (0-based) attempt."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class OpenLibraryClient:
+    def __init__(self, pool_size: int = POOL_SIZE, pacer: Optional[AdaptivePacer] = None):
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.pacer = pacer or AdaptivePacer()
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.bytes_downloaded = 0  # decoded response bodies
+
+    def _count(self, retried: bool = False, nbytes: int = 0) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bytes_downloaded += nbytes
+            if retried:
+                self.retries += 1
+
+    def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        endpoint: str = "default",
+    ) -> requests.Response:
+        """
+        Paced GET with retries. Returns the final response (which may still
+        be an error status once retries are exhausted); connection errors
+        are re-raised after the last attempt.
+        """
+        timeout = ENDPOINT_TIMEOUTS.get(endpoint, ENDPOINT_TIMEOUTS["default"])
+
+        attempt = 0
+        while True:
+            last_attempt = attempt >= MAX_RETRIES
+            self.pacer.wait()
+            try:
+                resp = self.session.get(url, params=params, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self._count(retried=not last_attempt)
+                if last_attempt:
+                    raise
+                self.pacer.on_throttle()
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            if resp.status_code in RETRY_STATUSES and not last_attempt:
+                self._count(retried=True)
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                pause = retry_after if retry_after is not None else backoff_delay(attempt)
+                pause = min(pause, BACKOFF_CAP)
+                self.pacer.on_throttle(pause)
+                time.sleep(pause)
+                attempt += 1
+                continue
+
+            self._count(nbytes=len(resp.content))
+            if resp.status_code < 400:
+                self.pacer.on_success()
+            return resp
+
+    def summary(self) -> str:
+        return (
+            f"HTTP client: {self.requests} requests, {self.retries} retried, "
+            f"{self.bytes_downloaded / 1_000_000:.2f} MB downloaded, "
+            f"final pace {self.pacer.rate:.2f} req/s"
+        )
+
+
+_CLIENT: Optional[OpenLibraryClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> OpenLibraryClient:
+    """Process-wide client so every caller shares one connection pool."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = OpenLibraryClient()
+        return _CLIENT
@@ -0,0 +1,110 @@
+"""
+ingest/covers.py
+
+Downloads Open Library covers once and stores small thumbnails in the
+local cover cache (catalogue/covers.py), so Book Finder can serve
+~10 KB WebP files instead of full-size remote JPEGs.
+
+Needs Pillow; without it the step is skipped and Book Finder keeps
+using the remote URLs.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, Optional, Tuple
+
+from catalogue.covers import THUMB_WIDTH, CoverCache
+from ingest.client import get_client
+
+
+COVER_WORKERS = 4
+MAX_NEW_COVERS = 500   # per run, keeps the weekly job bounded
+
+
+def make_thumbnail(data: bytes, width: int = THUMB_WIDTH) -> Optional[Tuple[bytes, str]]:
+    """Resize to `width` px wide; WebP if Pillow supports it, else JPEG."""
+    from PIL import Image
+
+    try:
+        img = Image.open(BytesIO(data))
+        img = img.convert("RGB")
+    except OSError:
+        return None
+    img.thumbnail((width, width * 2))
+    out = BytesIO()
+    try:
+        img.save(out, format="WEBP", quality=80, method=4)
+        return out.getvalue(), "webp"
+    except (OSError, KeyError):
+        out = BytesIO()
+        img.save(out, format="JPEG", quality=80, optimize=True)
+        return out.getvalue(), "jpg"
+
+
+def fetch_cover(url: str) -> Optional[bytes]:
+    # default=false makes Open Library 404 instead of sending a blank placeholder
+    try:
+        resp = get_client().get(url, params={"default": "false"}, endpoint="covers")
+    except Exception:
+        return None
+    if resp.status_code != 200 or not resp.headers.get("Content-Type", "").startswith("image/"):
+        return None
+    return resp.content
+
+
+def _thumbnail_for(url: str) -> Optional[Tuple[bytes, str]]:
+    data = fetch_cover(url)
+    return make_thumbnail(data) if data else None
+
+
+def cache_covers(
+    urls: Iterable[str],
+    cache: Optional[CoverCache] = None,
+    workers: int = COVER_WORKERS,
+    max_new: int = MAX_NEW_COVERS,
+) -> Dict[str, int]:
+    """
+    Evict covers no longer in `urls` down to the size cap, then download
+    thumbnails for the missing ones (up to max_new per call) while the
+    cache is under the cap, and save the manifest. The cap is checked
+    between batches of `workers` downloads.
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("Pillow not installed; skipping cover thumbnails.")
+        return {"cached": 0, "failed": 0, "evicted": 0, "remote": 0}
+
+    cache = cache or CoverCache()
+    wanted = list(dict.fromkeys(u for u in urls if isinstance(u, str) and u))
+    evicted = cache.evict(referenced=set(wanted))
+    forgotten = cache.forget_failures(set(wanted))
+    # Only downloads get a new timestamp: marking every catalogue URL as
+    # used each run would rewrite the whole manifest. Recent failures are
+    # skipped, so covers that never load can't take the whole budget.
+    missing = [u for u in wanted if cache.should_fetch(u)][:max_new]
+
+    cached = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(missing), workers):
+            if cache.total_bytes() >= cache.max_bytes:
+                break
+            batch = missing[start:start + workers]
+            for url, thumb in zip(batch, pool.map(_thumbnail_for, batch)):
+                if thumb is None:
+                    cache.mark_failed(url)
+                    failed += 1
+                    continue
+                cache.add(url, *thumb)
+                cached += 1
+
+    # The new thumbnails may have pushed it over again; settle it in this run
+    evicted += cache.evict(referenced=set(wanted))
+    if cached or evicted or failed or forgotten:
+        cache.save()
+    remote = sum(1 for u in wanted if u not in cache)
+    print(
+        f"Covers: {cached} new thumbnails, {failed} unavailable, {evicted} evicted, "
+        f"{remote} shown from Open Library, {cache.total_bytes() / 1_000_000:.1f} MB cached"
+    )
+    return {"cached": cached, "failed": failed, "evicted": evicted, "remote": remote}
@@ -0,0 +1,203 @@
+"""
+ingest/enrich.py
+
+Enrichment stage, run over a catalogue CSV after the search crawl.
+
+Only blank cells are filled, so it is safe on the curated master too:
+- series_order: parsed from the series string ("Bridgerton #2",
+  "Outlander, Book 3", "Dune (1)"), once per distinct string
+- description (+ subjects): one /works/<key>.json per distinct work;
+  Open Library has no batch endpoint for work descriptions, so these are
+  de-duplicated, cached and fetched concurrently instead
+- subjects (and series, first-sentence fallback for the description) for
+  whatever is still missing: one search request per ENRICH_BATCH works,
+  using q=key:("/works/A" OR "/works/B" ...)
+
+The crawl itself now only issues search requests; descriptions are no
+longer fetched while paging.
+
+    python -m ingest.enrich data/romance_catalogue.csv
+"""
+
+import csv
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from catalogue.store import atomic_replace
+from ingest.http_cache import SEARCH_TTL, WORK_TTL, get_cache
+from ingest.merge import RAW_COLUMNS
+from ingest.search import SEARCH_URL, join_subjects, parse_series
+
+
+WORK_URL = "https://openlibrary.org{key}.json"
+
+DESCRIPTION_WORKERS = 8   # max concurrent /works/<key>.json requests
+ENRICH_BATCH = 50         # works per batched search lookup
+ENRICH_CHUNK = 1000       # rows enriched (and held in memory) at a time
+ENRICH_FIELDS = ["key", "subject", "series", "first_sentence"]
+
+
+def _blank(value: Any) -> bool:
+    return value is None or str(value).strip() == ""
+
+
+def work_key_from_link(link: str) -> str:
+    """'https://openlibrary.org/works/OL1W' -> '/works/OL1W' ('' if not a work)."""
+    idx = (link or "").find("/works/")
+    return link[idx:] if idx >= 0 else ""
+
+
+def fetch_work(work_key: str) -> Dict[str, Any]:
+    if not work_key:
+        return {}
+    try:
+        return get_cache().get_json(WORK_URL.format(key=work_key), ttl=WORK_TTL, endpoint="works")
+    except Exception:
+        return {}
+
+
+def work_description(work: Dict[str, Any]) -> str:
+    desc = work.get("description")
+    if isinstance(desc, dict):
+        desc = desc.get("value", "")
+    return desc.replace("\n", " ").strip() if isinstance(desc, str) else ""
+
+
+def lookup_works(work_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Search docs for up to ENRICH_BATCH works in a single request."""
+    query = " OR ".join(f'"{key}"' for key in work_keys)
+    params = {
+        "q": f"key:({query})",
+        "fields": ",".join(ENRICH_FIELDS),
+        "limit": len(work_keys),
+    }
+    try:
+        data = get_cache().get_json(SEARCH_URL, params=params, ttl=SEARCH_TTL, endpoint="search")
+    except Exception as e:
+        print(f"Batched lookup of {len(work_keys)} works failed: {e}")
+        return {}
+    return {doc.get("key"): doc for doc in data.get("docs", []) if doc.get("key")}
+
+
+class Enricher:
+    """Fills blank metadata on catalogue rows; keeps request counts for the summary."""
+
+    def __init__(self, workers: int = DESCRIPTION_WORKERS, batch_size: int = ENRICH_BATCH):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.rows = 0
+        self.work_fetches = 0
+        self.batch_lookups = 0
+        self.filled: Dict[str, int] = {"description": 0, "subjects": 0, "series_order": 0}
+
+    def _fill(self, row: Dict[str, Any], col: str, value: Any) -> None:
+        if _blank(row.get(col)) and not _blank(value):
+            row[col] = value
+            if col in self.filled:
+                self.filled[col] += 1
+
+    def _fill_series_order(self, row: Dict[str, Any]) -> None:
+        # series_name itself is left as it is: it may be curated
+        if _blank(row.get("series_name")) or not _blank(row.get("series_order")):
+            return
+        _, order = parse_series(str(row["series_name"]))
+        if order is not None:
+            self._fill(row, "series_order", order)
+
+    def enrich(self, rows: List[Dict[str, Any]]) -> None:
+        """Fill series order, descriptions and subjects in place."""
+        self.rows += len(rows)
+        keys = [work_key_from_link(row.get("link", "")) for row in rows]
+        for row in rows:
+            row.setdefault("subjects", "")
+            self._fill_series_order(row)
+
+        # 1. Work JSON for rows without a description (also carries subjects)
+        wanted = list(dict.fromkeys(
+            key for row, key in zip(rows, keys) if key and _blank(row.get("description"))
+        ))
+        if wanted:
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+                works = dict(zip(wanted, pool.map(fetch_work, wanted)))
+            self.work_fetches += len(wanted)
+            for row, key in zip(rows, keys):
+                work = works.get(key)
+                if work:
+                    self._fill(row, "description", work_description(work))
+                    self._fill(row, "subjects", join_subjects(work.get("subjects")))
+
+        # 2. One batched search per ENRICH_BATCH works for whatever is still missing
+        wanted = list(dict.fromkeys(
+            key for row, key in zip(rows, keys)
+            if key and (_blank(row.get("subjects")) or _blank(row.get("description")))
+        ))
+        docs: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(wanted), self.batch_size):
+            docs.update(lookup_works(wanted[start:start + self.batch_size]))
+            self.batch_lookups += 1
+        for row, key in zip(rows, keys):
+            doc = docs.get(key)
+            if not doc:
+                continue
+            self._fill(row, "subjects", join_subjects(doc.get("subject")))
+            series = doc.get("series")
+            if isinstance(series, list):
+                series = series[0] if series else ""
+            if _blank(row.get("series_name")) and not _blank(series):
+                # Straight from Open Library: split "Bridgerton #2" before storing it
+                name, order = parse_series(str(series))
+                row["series_name"] = name
+                if order is not None:
+                    self._fill(row, "series_order", order)
+            sentence = doc.get("first_sentence")
+            if isinstance(sentence, list):
+                sentence = sentence[0] if sentence else ""
+            self._fill(row, "description", sentence)
+
+    def summary(self) -> str:
+        filled = ", ".join(f"{n} {col}" for col, n in self.filled.items())
+        return (
+            f"Enrichment: {self.rows} rows, {self.work_fetches} work fetches, "
+            f"{self.batch_lookups} batched lookups; filled {filled}"
+        )
+
+
+def _chunks(reader: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def enrich_csv(path: Path, enricher: Optional[Enricher] = None, chunk_size: int = ENRICH_CHUNK) -> Enricher:
+    """
+    Enrich a catalogue CSV in place, ENRICH_CHUNK rows at a time, writing to a
+    temp file that replaces the original at the end. Adds a `subjects`
+    column if the file doesn't have one yet; other columns are kept as-is.
+    """
+    enricher = enricher or Enricher()
+    with atomic_replace(path) as tmp_path, \
+            path.open("r", encoding="utf-8", newline="") as src, \
+            tmp_path.open("w", encoding="utf-8", newline="") as out:
+        reader = csv.DictReader(src)
+        fieldnames = list(reader.fieldnames or RAW_COLUMNS)
+        if "subjects" not in fieldnames:
+            fieldnames.append("subjects")
+        writer = csv.DictWriter(out, fieldnames=fieldnames, lineterminator="\n")
+        writer.writeheader()
+        for chunk in _chunks(reader, chunk_size):
+            enricher.enrich(chunk)
+            writer.writerows(chunk)
+    return enricher
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:] or [str(Path("data") / "romance_catalogue.csv")]:
+        result = enrich_csv(Path(arg))
+        print(f"{arg}: {result.summary()}")
@@ -0,0 +1,166 @@
+"""
+ingest/http_cache.py
+
+Persistent on-disk cache for Open Library JSON responses.
+
+Entries live in a single SQLite file keyed by URL + sorted query params.
+A fresh entry (younger than its TTL) is served without touching the network.
+A stale entry is revalidated with If-None-Match / If-Modified-Since, so a
+304 costs a round trip but no body download.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+from ingest.client import get_client
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CACHE_PATH = BASE_DIR / ".cache" / "openlibrary.sqlite"
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+SEARCH_TTL = 12 * HOUR   # search pages change as Open Library adds books
+WORK_TTL = 30 * DAY      # work descriptions rarely change
+MAX_ENTRY_AGE = 90 * DAY  # entries untouched for this long are pruned
+
+
+class ResponseCache:
+    def __init__(self, path: Path = CACHE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key           TEXT PRIMARY KEY,
+                body          BLOB NOT NULL,
+                etag          TEXT,
+                last_modified TEXT,
+                fetched_at    REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        if not params:
+            return url
+        return f"{url}?{urlencode(sorted(params.items()))}"
+
+    def _count(self, counter: str) -> None:
+        # Lookups come from the concurrent fetch workers
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _load(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+    def _store(self, key: str, body: bytes, etag: Optional[str], last_modified: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, body, etag, last_modified, time.time()),
+            )
+            self._conn.commit()
+
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+
+    def get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        ttl: float = SEARCH_TTL,
+        endpoint: str = "default",
+    ) -> Any:
+        """
+        GET url and return the decoded JSON body, going through the cache.
+        Cache hits never touch the network (or the client's pacing);
+        misses go through the shared client with its retries and
+        per-endpoint timeouts. HTTP errors are raised like raise_for_status().
+        """
+        key = self.make_key(url, params)
+        entry = self._load(key)
+
+        if entry is not None and time.time() - entry[3] < ttl:
+            self._count("hits")
+            return json.loads(entry[0])
+
+        headers = {}
+        if entry is not None:
+            if entry[1]:
+                headers["If-None-Match"] = entry[1]
+            if entry[2]:
+                headers["If-Modified-Since"] = entry[2]
+
+        resp = get_client().get(url, params=params, headers=headers, endpoint=endpoint)
+
+        if resp.status_code == 304 and entry is not None:
+            self._count("revalidated")
+            self._touch(key)
+            return json.loads(entry[0])
+
+        resp.raise_for_status()
+        self._count("misses")
+        self._store(
+            key,
+            resp.content,
+            resp.headers.get("ETag"),
+            resp.headers.get("Last-Modified"),
+        )
+        return resp.json()
+
+    def prune(self, max_age: float = MAX_ENTRY_AGE) -> int:
+        """Drop entries not refreshed within max_age seconds."""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM responses WHERE fetched_at < ?",
+                (time.time() - max_age,),
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def summary(self) -> str:
+        with self._lock:
+            hits, revalidated, misses = self.hits, self.revalidated, self.misses
+        total = hits + revalidated + misses
+        return (
+            f"HTTP cache: {hits} hits, {revalidated} revalidated (304), "
+            f"{misses} misses out of {total} lookups ({self.path.name})"
+        )
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """Process-wide cache instance, opened (and pruned) on first use."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResponseCache()
+            _CACHE.prune()
+        return _CACHE
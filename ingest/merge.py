@@ -0,0 +1,174 @@
+"""
+ingest/merge.py
+
+Streaming merge of a raw crawl CSV into the master catalogue.
+
+The master is never loaded into pandas as a whole:
+- known links are read in chunks (link column only) and kept as a sorted
+  array of 64-bit hashes (~8 bytes per book instead of a Python string),
+- the existing master bytes are copied as-is and only NEW rows are appended,
+  so curator-added columns and hand edits are preserved exactly,
+- the result is written to a temp file next to the master and swapped in
+  with os.replace, so a crash never leaves a half-written catalogue.
+
+If the raw CSV brings a column the master doesn't have yet, the master is
+streamed row by row once to add the (blank) column.
+"""
+
+import csv
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+
+
+LINK_CHUNK_ROWS = 200_000
+
+RAW_COLUMNS = [
+    "id", "title", "author", "series_name",
+    "series_order", "year", "description", "link", "cover_url", "subjects",
+]
+
+# Descriptions can be long; the default 128 KB field limit is too tight
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def hash_links(links: Iterable[str]) -> np.ndarray:
+    """Stable 64-bit hashes of link strings (same value across runs)."""
+    values = np.asarray(links if isinstance(links, np.ndarray) else list(links), dtype=object)
+    if not len(values):
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_array(values, categorize=False)
+
+
+class LinkIndex:
+    """
+    Set-like membership test for links, backed by a sorted uint64 hash array.
+
+    A 64-bit collision (treating a new book as known) is astronomically
+    unlikely at catalogue sizes; it would only delay that book to a later run.
+    """
+
+    def __init__(self, hashes: np.ndarray):
+        self.hashes = np.unique(hashes)
+        self.added = set()
+
+    def __len__(self) -> int:
+        return len(self.hashes) + len(self.added)
+
+    def __contains__(self, link: str) -> bool:
+        h = int(hash_links([link])[0])
+        if h in self.added:
+            return True
+        pos = np.searchsorted(self.hashes, h)
+        return pos < len(self.hashes) and int(self.hashes[pos]) == h
+
+    def add(self, link: str) -> None:
+        self.added.add(int(hash_links([link])[0]))
+
+
+def read_header(path: Path) -> List[str]:
+    with path.open("r", encoding="utf-8", newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def load_known_links(master_path: Path, chunksize: int = LINK_CHUNK_ROWS) -> LinkIndex:
+    """Links already present in the master catalogue (empty if no master yet)."""
+    if not master_path.exists() or "link" not in read_header(master_path):
+        return LinkIndex(np.empty(0, dtype=np.uint64))
+    parts = []
+    for chunk in pd.read_csv(
+        master_path, usecols=["link"], dtype=str, keep_default_na=False, chunksize=chunksize
+    ):
+        links = chunk["link"].to_numpy(dtype=object)
+        parts.append(hash_links(links[links != ""]))
+    return LinkIndex(np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64))
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _copy_master(master_path: Path, out_path: Path, columns: List[str], extra: List[str]) -> None:
+    """Copy master rows to `out_path`, adding blank `extra` columns if needed."""
+    if not extra:
+        with master_path.open("rb") as src, out_path.open("wb") as out:
+            shutil.copyfileobj(src, out, length=1 << 20)
+            if not _ends_with_newline(master_path):
+                out.write(b"\n")
+        return
+
+    padding = [""] * len(extra)
+    with master_path.open("r", encoding="utf-8", newline="") as src, \
+            out_path.open("w", encoding="utf-8", newline="") as out:
+        reader = csv.reader(src)
+        next(reader, None)
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(columns)
+        for row in reader:
+            writer.writerow(row + padding)
+
+
+def merge_into_master(raw_path: Path, master_path: Path) -> int:
+    """
+    Merge raw data into master catalogue.
+    - Uses 'link' as a unique key.
+    - Preserves existing rows & columns (bytes are copied untouched).
+    - Only appends NEW links.
+    Returns the number of rows added.
+    """
+    print(f"Merging {raw_path.name} into {master_path.name}...")
+
+    raw_columns = read_header(raw_path)
+    master_columns = read_header(master_path) if master_path.exists() else []
+    # Master may have extra cols (spice_level, tropes, etc.); raw columns it
+    # lacks (new technical fields) are added blank to the existing rows
+    base = master_columns or list(RAW_COLUMNS)
+    extra = list(dict.fromkeys(c for c in RAW_COLUMNS + raw_columns if c not in base))
+    columns = base + extra
+
+    known = load_known_links(master_path)
+    tmp_path = master_path.with_name(master_path.name + ".tmp")
+    added = 0
+    try:
+        if master_columns:
+            _copy_master(master_path, tmp_path, columns, extra)
+        else:
+            # Start fresh master with just the raw columns
+            with tmp_path.open("w", encoding="utf-8", newline="") as out:
+                csv.writer(out, lineterminator="\n").writerow(columns)
+
+        with tmp_path.open("a", encoding="utf-8", newline="") as out:
+            writer = csv.DictWriter(
+                out, fieldnames=columns, restval="", extrasaction="ignore", lineterminator="\n"
+            )
+            with raw_path.open("r", encoding="utf-8", newline="") as src:
+                for row in csv.DictReader(src):
+                    link = row.get("link") or ""
+                    if link:
+                        if link in known:
+                            continue
+                        known.add(link)
+                    writer.writerow(row)
+                    added += 1
+
+        if not added:
+            tmp_path.unlink()
+            print("No new books to add to master.")
+            return 0
+        os.replace(tmp_path, master_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    print(f"Added {added} new books to {master_path.name}")
+    return added
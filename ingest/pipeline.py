@@ -0,0 +1,353 @@
+"""
+ingest/pipeline.py
+
+The catalogue update as a sequence of stages:
+
+    crawl -> filter -> write raw -> enrich -> tag -> merge -> publish
+
+- crawl:     search pages from the sharded crawl (ingest/search.py, ingest/shards.py)
+- filter:    romance docs only, one row per work, books already in the
+             master skipped before anything else is spent on them
+- write raw: rows appended to the raw CSV round by round, with a
+             checkpoint after each round (ingest/checkpoint.py)
+- enrich:    descriptions, subjects, series order (ingest/enrich.py)
+- tag:       suggested spice / facets for blank cells (ingest/tagger.py)
+- merge:     new rows streamed into the master (ingest/merge.py), and
+             upserted into the optional SQLite catalogue
+- publish:   Parquet copy and description store of the master, cover thumbnails
+
+Each stage's wall time and counters are kept in StageStats and printed at
+the end. Without a master (master_path=None) the pipeline stops once the
+raw CSV is enriched, which is what update_openlibrary_romance.py uses.
+"""
+
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from catalogue.descriptions import write_descriptions
+from catalogue.sqlite_store import DB_PATH, upsert_csv
+from catalogue.store import write_columnar
+from ingest.checkpoint import CHECKPOINT_PATH, CrawlCheckpoint, RawCsvWriter, read_raw_links
+from ingest.client import get_client
+from ingest.covers import cache_covers
+from ingest.enrich import DESCRIPTION_WORKERS, Enricher, enrich_csv
+from ingest.http_cache import get_cache
+from ingest.merge import LinkIndex, load_known_links, merge_into_master
+from ingest.search import PAGE_SIZE, crawl_shards, doc_to_row, fetch_page, is_romance_doc
+from ingest.shards import MAX_PAGE_FAILURES, SHARD_WORKERS, ShardedCrawl
+from ingest.tagger import tag_csv, tag_summary
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+MASTER_PATH = DATA_DIR / "romance_catalogue.csv"
+
+TARGET_COUNT = 2000  # new rows per run
+STAGES = ["crawl", "filter", "write raw", "enrich", "tag", "merge", "publish"]
+
+
+def make_raw_output_path(data_dir: Path = DATA_DIR) -> Path:
+    """Generate a yymmdd-stamped filename."""
+    stamp = datetime.utcnow().strftime("%y%m%d")
+    return data_dir / f"romance_catalogue_{stamp}.csv"
+
+
+@dataclass
+class PipelineConfig:
+    target_count: int = TARGET_COUNT
+    shard_workers: int = SHARD_WORKERS
+    description_workers: int = DESCRIPTION_WORKERS
+    max_page_failures: int = MAX_PAGE_FAILURES
+    master_path: Optional[Path] = MASTER_PATH   # None: write the raw CSV only
+    raw_path: Optional[Path] = None             # None: date-stamped, next to the master
+    checkpoint_path: Optional[Path] = CHECKPOINT_PATH  # None: no resume
+    db_path: Path = DB_PATH                     # upserted only if it exists
+    tag: bool = True
+    covers: bool = True
+    dry_run: bool = False   # crawl, enrich and tag into a temp file; change nothing
+
+
+class StageStats:
+    """Wall time and counters per stage."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block; repeated blocks of the same stage add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, stage: str, counter: str, n: int = 1) -> None:
+        counters = self.counters.setdefault(stage, {})
+        counters[counter] = counters.get(counter, 0) + n
+
+    def summary(self) -> str:
+        lines = ["Stages:"]
+        for name in dict.fromkeys([*STAGES, *self.seconds, *self.counters]):
+            if name not in self.seconds and name not in self.counters:
+                continue
+            counters = ", ".join(f"{k} {v}" for k, v in self.counters.get(name, {}).items())
+            lines.append(f"  {name:<10} {self.seconds.get(name, 0.0):8.2f} s  {counters}")
+        return "\n".join(lines)
+
+
+class DocFilter:
+    """Turns search docs into new catalogue rows (filter stage)."""
+
+    def __init__(self, known: LinkIndex, seen: Set[str], stats: StageStats):
+        self.known = known   # links in the master
+        self.seen = seen     # links collected by this crawl
+        self.stats = stats
+        self.skipped_known = 0
+
+    def rows(self, docs: List[Dict[str, Any]], next_id: int, limit: int) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        for doc in docs:
+            if len(rows) >= limit:
+                break
+            self.stats.count("filter", "docs")
+            if not is_romance_doc(doc):
+                self.stats.count("filter", "not romance")
+                continue
+
+            row = doc_to_row(doc, row_id=next_id + len(rows))
+            if not row["title"] or not row["author"]:
+                self.stats.count("filter", "incomplete")
+                continue
+            link = row["link"]
+            if link:
+                # The same work often shows up in several shards
+                if link in self.seen:
+                    self.stats.count("filter", "duplicates")
+                    continue
+                if link in self.known:
+                    self.stats.count("filter", "known")
+                    self.skipped_known += 1
+                    continue
+                self.seen.add(link)
+            rows.append(row)
+        self.stats.count("filter", "kept", len(rows))
+        return rows
+
+
+class Pipeline:
+    def __init__(self, config: Optional[PipelineConfig] = None):
+        self.config = config or PipelineConfig()
+        self.stats = StageStats()
+        # A dry run never reads or writes the checkpoint
+        self.checkpoint_path = None if self.config.dry_run else self.config.checkpoint_path
+
+    def _save(self, checkpoint: CrawlCheckpoint) -> None:
+        if self.checkpoint_path is not None:
+            checkpoint.save(self.checkpoint_path)
+
+    def start_or_resume(self) -> CrawlCheckpoint:
+        """Pick up an interrupted crawl, or start a new one."""
+        config = self.config
+        checkpoint = None
+        if self.checkpoint_path is not None:
+            checkpoint = CrawlCheckpoint.load(self.checkpoint_path)
+        if checkpoint is not None and config.raw_path is not None \
+                and Path(checkpoint.raw_path) != config.raw_path:
+            print(f"Checkpoint is for {Path(checkpoint.raw_path).name}; starting a new crawl.")
+            checkpoint = None
+        if checkpoint is not None and checkpoint.is_stale():
+            print(f"Checkpoint for {Path(checkpoint.raw_path).name} is stale; starting a new crawl.")
+            leftover = Path(checkpoint.raw_path)
+            if checkpoint.rows and leftover.exists():
+                # Don't lose what the interrupted run collected. raw_bytes is
+                # the crawl's length; an enriched file is longer and complete.
+                if not checkpoint.enriched:
+                    RawCsvWriter(leftover, resume_at=checkpoint.raw_bytes).close()
+                    self.enrich(leftover)
+                self.merge(leftover)
+            checkpoint = None
+        if checkpoint is None:
+            raw_path = config.raw_path
+            if raw_path is None:
+                raw_path = make_raw_output_path(config.master_path.parent if config.master_path else DATA_DIR)
+            checkpoint = CrawlCheckpoint(raw_path=str(raw_path))
+        return checkpoint
+
+    def crawl(self, checkpoint: CrawlCheckpoint) -> None:
+        """
+        Crawl, filter and write raw until target_count new rows are collected.
+        Rows are appended to the raw CSV round by round and the checkpoint is
+        saved after each round, so an interrupted run resumes where it stopped.
+        """
+        config, stats = self.config, self.stats
+        raw_path = Path(checkpoint.raw_path)
+        raw_path.parent.mkdir(parents=True, exist_ok=True)
+        shards = ShardedCrawl(
+            crawl_shards(),
+            fetch=lambda query, page: fetch_page(query, page=page, limit=PAGE_SIZE),
+            cursors=checkpoint.cursors,
+            finished=checkpoint.finished,
+            workers=config.shard_workers,
+            max_failures=config.max_page_failures,
+        )
+
+        with stats.stage("filter"):
+            if config.master_path is not None:
+                known = load_known_links(config.master_path)
+                print(f"{len(known)} books already in {config.master_path.name} will be skipped")
+            else:
+                known = LinkIndex(np.empty(0, dtype=np.uint64))
+            seen: Set[str] = set()
+        doc_filter = DocFilter(known, seen, stats)
+
+        with RawCsvWriter(raw_path, resume_at=checkpoint.raw_bytes) as writer:
+            if checkpoint.raw_bytes:
+                seen.update(link for link in read_raw_links(raw_path) if link)
+                print(f"Resuming with {checkpoint.rows} rows already collected")
+            checkpoint.raw_bytes = writer.size
+            self._save(checkpoint)
+
+            while checkpoint.rows < config.target_count:
+                active = shards.active()
+                if not active:
+                    break
+                print(f"Fetching {', '.join(f'{s.name} p{checkpoint.cursors[s.name]}' for s in active)}...")
+                with stats.stage("crawl"):
+                    pages = shards.next_round()
+                stats.count("crawl", "pages", len(pages))
+
+                # Rows are written without descriptions; the enrich stage
+                # fetches those only for docs that were actually kept.
+                with stats.stage("filter"):
+                    known_before = doc_filter.skipped_known
+                    round_rows: List[Dict[str, Any]] = []
+                    for _, _, docs in pages:
+                        round_rows += doc_filter.rows(
+                            docs,
+                            next_id=checkpoint.row_id + len(round_rows),
+                            limit=config.target_count - checkpoint.rows - len(round_rows),
+                        )
+
+                with stats.stage("write raw"):
+                    checkpoint.raw_bytes = writer.write_rows(round_rows)
+                    checkpoint.rows += len(round_rows)
+                    checkpoint.row_id += len(round_rows)
+                    checkpoint.skipped_known += doc_filter.skipped_known - known_before
+                    self._save(checkpoint)
+                stats.count("write raw", "rows", len(round_rows))
+
+        if checkpoint.rows < config.target_count and not shards.exhausted:
+            # Some shards were paused after repeated failures; the next run
+            # retries them from the checkpoint.
+            print(f"Paused shards: {', '.join(sorted(shards.paused))}")
+            return
+        checkpoint.complete = True
+        self._save(checkpoint)
+
+    def enrich(self, raw_path: Path) -> None:
+        with self.stats.stage("enrich"):
+            enricher = enrich_csv(raw_path, Enricher(workers=self.config.description_workers))
+        print(enricher.summary())
+        self.stats.count("enrich", "work fetches", enricher.work_fetches)
+        self.stats.count("enrich", "batched lookups", enricher.batch_lookups)
+        for col, n in enricher.filled.items():
+            self.stats.count("enrich", col, n)
+
+        if self.config.tag:
+            with self.stats.stage("tag"):
+                filled = tag_csv(raw_path)
+            print(tag_summary(filled))
+            self.stats.count("tag", "cells", sum(filled.values()))
+
+    def merge(self, raw_path: Path) -> None:
+        """Merge a raw CSV into the master (and the SQLite backend, if used)."""
+        master_path = self.config.master_path
+        if master_path is None:
+            return
+        with self.stats.stage("merge"):
+            added = merge_into_master(raw_path, master_path)
+            self.stats.count("merge", "added", added)
+            if self.config.db_path.exists():
+                # Optional SQLite backend: row-level upserts, curated fields untouched
+                n = upsert_csv(raw_path, self.config.db_path, curated=False)
+                print(f"Upserted {n} books into {self.config.db_path.name}")
+                self.stats.count("merge", "sqlite upserts", n)
+
+    def publish(self) -> None:
+        """Columnar copy, description store and cover thumbnails for Book Finder."""
+        master_path = self.config.master_path
+        if master_path is None or not master_path.exists():
+            return
+        with self.stats.stage("publish"):
+            write_columnar(master_path)
+            write_descriptions(master_path)
+            if self.config.covers:
+                covers = pd.read_csv(master_path, usecols=lambda c: c == "cover_url", dtype=str)
+                if "cover_url" in covers.columns:
+                    cache_covers(covers["cover_url"].dropna())
+
+    def run(self) -> StageStats:
+        config = self.config
+        if config.dry_run:
+            return self._dry_run()
+
+        checkpoint = self.start_or_resume()
+        raw_path = Path(checkpoint.raw_path)
+        print(f"Fetching romance books… target ~{config.target_count} new rows")
+        print(f"Raw output: {raw_path}")
+
+        if checkpoint.complete:
+            print("Crawl already finished by the previous run; skipping it.")
+        else:
+            self.crawl(checkpoint)
+        print(f"Collected {checkpoint.rows} new romance-ish books.")
+        print(f"Skipped {checkpoint.skipped_known} already-known books (description fetches avoided).")
+        print(f"Wrote {checkpoint.rows} rows to {raw_path.resolve()}")
+
+        if not checkpoint.complete and self.checkpoint_path is not None:
+            # Enriching rewrites the raw CSV, which the next run appends to
+            # from checkpoint.raw_bytes; leave it alone until the crawl is done.
+            print("Crawl not finished; the next run resumes it before enriching and merging.")
+            self.print_summary()
+            return self.stats
+
+        if not checkpoint.enriched:
+            self.enrich(raw_path)
+            checkpoint.enriched = checkpoint.complete
+            self._save(checkpoint)
+
+        self.merge(raw_path)
+        self.publish()
+        if checkpoint.complete and self.checkpoint_path is not None:
+            CrawlCheckpoint.clear(self.checkpoint_path)
+        self.print_summary()
+        return self.stats
+
+    def _dry_run(self) -> StageStats:
+        """Crawl, enrich and tag into a temp file; no checkpoint, master or DB changes."""
+        config = self.config
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_path = config.raw_path or Path(tmp) / "romance_catalogue_dry_run.csv"
+            checkpoint = CrawlCheckpoint(raw_path=str(raw_path))
+            print(f"Dry run: target ~{config.target_count} new rows, nothing is merged")
+            self.crawl(checkpoint)
+            self.enrich(raw_path)
+            print(f"Dry run: {checkpoint.rows} new books would be merged into "
+                  f"{config.master_path.name if config.master_path else 'nothing'}")
+        self.print_summary()
+        return self.stats
+
+    def print_summary(self) -> None:
+        print(self.stats.summary())
+        print(get_cache().summary())
+        print(get_client().summary())
@@ -0,0 +1,155 @@
+"""
+ingest/search.py
+
+Open Library search: which queries the crawl pages through, and how a
+search doc becomes a catalogue row.
+
+Only the fields doc_to_row / is_romance_doc read are requested, and the
+subject filter is pushed to the server; descriptions are left blank for
+the enrichment stage (ingest/enrich.py). The search URL and the series /
+subject parsing are shared with that stage, which imports them from here.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from ingest.http_cache import SEARCH_TTL, get_cache
+from ingest.shards import Shard, build_shards, subject_clause
+
+
+SEARCH_URL = "https://openlibrary.org/search.json"
+
+ROMANCE_SUBJECTS = [
+    "romance",
+    "romantic fiction",
+    "love stories",
+]
+
+# Only request the fields doc_to_row / is_romance_doc actually read.
+SEARCH_FIELDS = [
+    "key",
+    "title",
+    "author_name",
+    "series",
+    "first_publish_year",
+    "cover_i",
+    "subject",
+]
+PAGE_SIZE = 100
+MAX_SUBJECTS = 25
+
+# Ask Open Library to apply the subject filter server-side, so fewer
+# non-romance docs are transferred. is_romance_doc still runs locally.
+PUSH_SUBJECT_FILTER = True
+
+# Fan the crawl out over several narrower queries (one per subject, plus
+# the combined query sliced by first_publish_year decade), fetched in
+# parallel rounds and de-duplicated by work key (ingest/shards.py).
+# Needs PUSH_SUBJECT_FILTER; False pages through the single query.
+CRAWL_SHARDS = True
+SHARD_DECADES = list(range(1950, 2030, 10))
+
+# Only an explicit marker makes a trailing number an order: "#2", "Book 3",
+# "Vol. 4" or "(1)". "The 100" and "Area 51" are names.
+SERIES_ORDER_RE = re.compile(
+    r"""^(?P<name>.*?)[\s,;:\-–—]*
+        (?:(?:\#|\b(?:book|bk\.?|vol\.?|volume))\s*(?P<order>\d{1,3}(?:\.\d+)?)
+          |\(\s*(?:\#|book|bk\.?|vol\.?|volume)?\s*(?P<paren>\d{1,3}(?:\.\d+)?)\s*\)
+        )\s*$""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+def build_search_query() -> str:
+    """Search query string, e.g. 'subject:romance OR subject:"love stories"'."""
+    if not PUSH_SUBJECT_FILTER:
+        return "romance"
+    return " OR ".join(subject_clause(sub) for sub in ROMANCE_SUBJECTS)
+
+
+def crawl_shards() -> List[Shard]:
+    if CRAWL_SHARDS and PUSH_SUBJECT_FILTER:
+        return build_shards(ROMANCE_SUBJECTS, SHARD_DECADES)
+    return [Shard("all", build_search_query())]
+
+
+def fetch_page(query: str, page: int, limit: int = PAGE_SIZE) -> Dict[str, Any]:
+    params = {
+        "q": query,
+        "fields": ",".join(SEARCH_FIELDS),
+        "page": page,
+        "limit": limit,
+    }
+    return get_cache().get_json(SEARCH_URL, params=params, ttl=SEARCH_TTL, endpoint="search")
+
+
+@lru_cache(maxsize=None)
+def parse_series(series: str) -> Tuple[str, Optional[str]]:
+    """'Bridgerton #2' -> ('Bridgerton', '2'); no order marker -> (series, None)."""
+    series = series.strip()
+    match = SERIES_ORDER_RE.match(series)
+    if not match or not match.group("name").strip():
+        return series, None
+    order = match.group("order") or match.group("paren")
+    if "." in order:
+        order = order.rstrip("0").rstrip(".")
+    return match.group("name").strip(), order
+
+
+def join_subjects(subjects: Any) -> str:
+    if not isinstance(subjects, list):
+        return ""
+    seen: Dict[str, str] = {}
+    for subject in subjects:
+        if isinstance(subject, str) and subject.strip():
+            seen.setdefault(subject.strip().lower(), subject.strip().replace("|", "/"))
+    return "|".join(list(seen.values())[:MAX_SUBJECTS])
+
+
+def is_romance_doc(doc: Dict[str, Any]) -> bool:
+    subjects = doc.get("subject", []) or []
+    lower_subjects = " ".join(subjects).lower()
+    return any(sub in lower_subjects for sub in ROMANCE_SUBJECTS)
+
+
+def get_cover_url(doc: Dict[str, Any]) -> str:
+    cover_id = doc.get("cover_i")
+    if cover_id:
+        return f"https://covers.openlibrary.org/b/id/{cover_id}-L.jpg"
+    return ""
+
+
+def get_series_info(doc: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    series = doc.get("series")
+    if isinstance(series, list) and series:
+        name = series[0]
+    else:
+        name = series or ""
+    # 'Bridgerton #2' -> ('Bridgerton', '2'); 'Area 51' has no order marker and stays whole
+    return parse_series(name) if name else (name, None)
+
+
+def doc_to_row(doc: Dict[str, Any], row_id: int) -> Dict[str, Any]:
+    """Catalogue row for a search doc; the description is filled by enrichment."""
+    title = doc.get("title", "").strip()
+    authors = doc.get("author_name", []) or []
+    author = ", ".join(authors[:2])
+
+    series_name, series_order = get_series_info(doc)
+    year = doc.get("first_publish_year")
+    work_key = doc.get("key")
+    link = f"https://openlibrary.org{work_key}" if work_key else ""
+
+    return {
+        "id": row_id,
+        "title": title,
+        "author": author,
+        "series_name": series_name,
+        "series_order": series_order if series_order is not None else "",
+        "year": year if year is not None else "",
+        "description": "",
+        "link": link,
+        "cover_url": get_cover_url(doc),
+        "subjects": join_subjects(doc.get("subject")),
+    }
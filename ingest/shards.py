@@ -0,0 +1,126 @@
+"""
+ingest/shards.py
+
+Sharded search crawl: instead of paging through one big query, the crawl
+fans out over several narrower ones (one per romance subject, plus the
+combined subject query split by first_publish_year decade). Shards are
+fetched in rounds: every active shard's next page is requested in
+parallel, and the pages are then handed back in shard order, so a run is
+deterministic no matter which request finished first. All requests go
+through the shared client, so its AdaptivePacer is the single rate budget
+for every shard.
+
+Cursors (next page per shard) and finished shards are plain dicts/lists,
+so the caller can keep them in its checkpoint.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+
+SHARD_WORKERS = 4        # shards fetched concurrently per round
+MAX_PAGE_FAILURES = 3    # failed attempts at the same page before a shard is paused
+
+
+@dataclass(frozen=True)
+class Shard:
+    name: str
+    query: str
+
+
+def subject_clause(subject: str) -> str:
+    return f'subject:"{subject}"' if " " in subject else f"subject:{subject}"
+
+
+def build_shards(subjects: Sequence[str], decades: Sequence[int] = ()) -> List[Shard]:
+    """One shard per subject, plus the combined subject query per decade."""
+    shards = [Shard(f"subject:{s}", subject_clause(s)) for s in subjects]
+    combined = " OR ".join(subject_clause(s) for s in subjects)
+    for start in decades:
+        shards.append(Shard(
+            f"{start}s",
+            f"({combined}) AND first_publish_year:[{start} TO {start + 9}]",
+        ))
+    return shards
+
+
+class ShardedCrawl:
+    """
+    Round-robin pager over several search queries.
+
+    fetch(query, page) returns a search response; `cursors` and `finished`
+    are updated in place as pages come back.
+    """
+
+    def __init__(
+        self,
+        shards: Sequence[Shard],
+        fetch: Callable[[str, int], Dict[str, Any]],
+        cursors: Dict[str, int],
+        finished: List[str],
+        workers: int = SHARD_WORKERS,
+        max_failures: int = MAX_PAGE_FAILURES,
+    ):
+        self.shards = list(shards)
+        self.fetch = fetch
+        self.cursors = cursors
+        self.finished = finished
+        self.workers = workers
+        self.max_failures = max_failures
+        self.paused: Set[str] = set()                 # too many failures this run
+        self._failures: Dict[str, int] = {}
+        for shard in self.shards:
+            self.cursors.setdefault(shard.name, 1)
+
+    def active(self) -> List[Shard]:
+        return [
+            s for s in self.shards
+            if s.name not in self.finished and s.name not in self.paused
+        ]
+
+    @property
+    def exhausted(self) -> bool:
+        """Every shard has run out of results (paused shards still have pages left)."""
+        return all(s.name in self.finished for s in self.shards)
+
+    def _fetch(self, shard: Shard) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+        try:
+            return self.fetch(shard.query, self.cursors[shard.name]), None
+        except Exception as e:
+            return None, e
+
+    def next_round(self) -> List[Tuple[Shard, int, List[Dict[str, Any]]]]:
+        """
+        Fetch the next page of every active shard. Returns (shard, page, docs)
+        in shard order; cursors are advanced, empty shards marked finished.
+        """
+        shards = self.active()
+        if not shards:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(shards)))) as pool:
+            responses = list(pool.map(self._fetch, shards))
+
+        pages: List[Tuple[Shard, int, List[Dict[str, Any]]]] = []
+        for shard, (data, error) in zip(shards, responses):
+            page = self.cursors[shard.name]
+            if error is not None:
+                # The client already retried transient errors. The cursor stays
+                # on this page, so the next round (or the next run, once the
+                # shard is paused) asks for it again and no docs are skipped.
+                self._failures[shard.name] = self._failures.get(shard.name, 0) + 1
+                print(f"[{shard.name}] error fetching page {page}: {error}")
+                if self._failures[shard.name] >= self.max_failures:
+                    print(f"[{shard.name}] page {page} failed {self.max_failures} times, pausing shard.")
+                    self.paused.add(shard.name)
+                continue
+            self._failures.pop(shard.name, None)
+
+            docs = (data or {}).get("docs", [])
+            if not docs:
+                print(f"[{shard.name}] no more docs after page {page - 1}.")
+                self.finished.append(shard.name)
+                continue
+            self.cursors[shard.name] = page + 1
+            pages.append((shard, page, docs))
+        return pages
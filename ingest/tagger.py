@@ -0,0 +1,308 @@
+"""
+ingest/tagger.py
+
+Offline tag suggestions from Open Library subjects, titles and descriptions.
+
+A keyword dictionary (TAG_RULES) maps phrases to Book Finder labels
+('enemies to lovers' -> tropes: Enemies to Lovers, 'vampires' -> genres:
+Paranormal, 'erotica' -> spice_level 5, ...). Phrases are run through the
+same folding / tokenizing as the full-text index and compiled into one
+lookup table, so the whole catalogue is matched in a single pass per text
+column:
+- every column is tokenized at once (catalogue.fulltext.tokenize_column),
+- candidate positions are the tokens that start some phrase (one vectorized
+  isin over all tokens),
+- only those candidates are checked against the table, longest phrases
+  included, so work grows with the number of hits, not the dictionary size.
+
+A phrase right after "no" / "not" / "without" ("no cheating") is ignored.
+Single words ("vampires", "death", "magic") are only matched against the
+Open Library subjects, where they name what the book is about; titles and
+descriptions need a multi-word phrase ("enemies to lovers"), so a passing
+"death" or "king" in a blurb tags nothing.
+
+Suggestions only go into blank cells; curated values are never touched.
+Every cell the tagger fills is listed in the row's auto_tagged column
+("genres|tropes"), so machine suggestions stay distinguishable from
+hand-entered values (remove a column from that list to adopt its value).
+
+    python -m ingest.tagger data/romance_catalogue.csv
+"""
+
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from catalogue.fulltext import tokenize, tokenize_column
+from catalogue.index import FACET_COLUMNS
+from catalogue.store import atomic_replace
+
+
+# source column -> fewest tokens a phrase needs to count there
+TAG_SOURCES: Dict[str, int] = {"title": 2, "subjects": 1, "description": 2}
+TAG_SOURCE_COLUMNS = list(TAG_SOURCES)
+TAG_COLUMNS = ["spice_level"] + FACET_COLUMNS
+AUTO_TAGGED_COLUMN = "auto_tagged"   # tag columns filled by the tagger, pipe-separated
+NEGATIONS = {"no", "not", "without", "never", "zero"}
+
+# column -> label -> phrases. Labels are the Book Finder option values;
+# spice levels are matched as labels too and the highest one wins.
+TAG_RULES: Dict[str, Dict[str, List[str]]] = {
+    "spice_level": {
+        "5": ["erotica", "erotic", "erotic fiction", "erotic romance", "bdsm", "menage"],
+        "4": ["steamy", "explicit", "sexually explicit", "smut", "spicy"],
+        "3": ["sensual", "sensuality"],
+        "1": [
+            "clean romance", "sweet romance", "clean and wholesome", "closed door",
+            "christian fiction", "christian romance", "inspirational romance", "amish",
+        ],
+    },
+    "genres": {
+        "Contemporary": ["contemporary", "contemporary romance"],
+        "Historical": [
+            "historical", "historical romance", "historical fiction", "regency",
+            "regency fiction", "victorian", "medieval", "highlander", "highlanders",
+            "dukes and duchesses", "nobility", "viking", "vikings",
+        ],
+        "Fantasy": [
+            "fantasy", "fantasy fiction", "romantasy", "fae", "faerie", "faeries",
+            "fairies", "dragons", "magic", "sorcerer", "witches and wizards",
+        ],
+        "Paranormal": [
+            "paranormal", "paranormal romance", "vampire", "vampires", "werewolf",
+            "werewolves", "shifter", "shifters", "shapeshifting", "shape shifting",
+            "ghost", "ghosts", "demons", "witches",
+        ],
+        "Dark Romance": ["dark romance", "mafia", "organized crime", "captive", "kidnapping", "stalker"],
+        "Romantic Suspense": [
+            "romantic suspense", "suspense", "suspense fiction", "thriller", "thrillers",
+            "mystery", "detective and mystery stories", "serial killer",
+        ],
+        "Sci-Fi": [
+            "science fiction", "sci fi", "scifi", "space opera", "aliens", "alien",
+            "cyborg", "cyborgs", "dystopia", "dystopian",
+        ],
+        "Sports Romance": [
+            "sports romance", "hockey", "ice hockey", "football", "quarterback",
+            "baseball", "soccer", "basketball", "rugby", "athletes",
+        ],
+    },
+    "relationship": {
+        "Love Triangle": ["love triangle", "love triangles"],
+        "Why Choose": ["why choose", "reverse harem"],
+        "Polyamory": ["polyamory", "polyamorous", "throuple"],
+    },
+    "tropes": {
+        "Enemies to Lovers": ["enemies to lovers", "enemies turned lovers", "sworn enemy", "sworn enemies", "rivals to lovers"],
+        "Friends to Lovers": [
+            "friends to lovers", "best friends to lovers", "in love with her best friend",
+            "in love with his best friend", "falling for her best friend", "falling for his best friend",
+        ],
+        "Childhood Friends": ["childhood friend", "childhood friends", "childhood sweetheart", "childhood sweethearts"],
+        "Fake Dating": [
+            "fake dating", "fake relationship", "fake engagement", "fake fiance",
+            "fake girlfriend", "fake boyfriend", "pretend relationship",
+        ],
+        "Forced Proximity": ["forced proximity", "snowed in", "stranded together", "road trip"],
+        "Marriage of Convenience": [
+            "marriage of convenience", "arranged marriage", "arranged marriages",
+            "contract marriage", "marriage pact", "mail order bride",
+        ],
+        "Fated Mates": ["fated mates", "fated mate", "true mate", "mate bond"],
+        "Second Chance": ["second chance", "second chance romance", "second chances", "reunited"],
+        "Single Parent": [
+            "single parent", "single parents", "single father", "single fathers", "single dad",
+            "single mother", "single mothers", "single mom", "widowed father",
+        ],
+        "Forbidden Romance": ["forbidden romance", "forbidden love"],
+        "Grumpy / Sunshine": ["grumpy sunshine", "grumpy meets sunshine", "grumpy x sunshine"],
+        "Boss / Employee": [
+            "boss employee", "office romance", "workplace romance", "his assistant",
+            "her boss", "my boss", "his secretary", "personal assistant",
+        ],
+        "Bodyguard": ["bodyguard", "bodyguards", "bodyguard romance"],
+        "Only One Bed": ["only one bed", "one bed"],
+        "Slow Burn": ["slow burn"],
+    },
+    "content_warnings": {
+        "Violence": ["violence", "violent", "torture"],
+        "Abuse": ["abuse", "abusive", "domestic violence", "sexual abuse", "child abuse"],
+        "Cheating": ["cheating", "infidelity", "adultery", "unfaithful"],
+        "Death": ["death", "grief", "widow", "widower", "murder", "bereavement"],
+        "Addiction": ["addiction", "alcoholism", "alcoholic", "drug abuse", "substance abuse", "overdose"],
+        "Dubious Consent": ["dubious consent", "dub con", "dubcon"],
+        "Non-Consensual": ["non consensual", "noncon", "rape"],
+        "Mental Health": ["mental health", "mental illness", "depression", "anxiety", "ptsd", "trauma"],
+        "Self-Harm": ["self harm", "suicide", "suicidal"],
+    },
+    "hero_traits": {
+        "Morally Grey": ["morally grey hero", "morally gray hero", "antihero", "anti hero", "villain"],
+        "Grumpy": ["grumpy hero"],
+        "Sunshine": ["sunshine hero"],
+        "Alpha": ["alpha male", "alpha males", "alpha hero", "alphahole"],
+        "Soft Dom": ["soft dom"],
+        "Cinnamon Roll": ["cinnamon roll"],
+        "Tattooed": ["tattooed", "tattoo artist", "tattoos"],
+        "Biker": ["biker", "bikers", "motorcycle club", "motorcycle gangs", "mc romance"],
+        "Royalty": ["prince", "princes", "crown prince", "kings and rulers", "royalty"],
+        "Billionaire": ["billionaire", "billionaires", "millionaire", "millionaires", "tycoon", "ceo"],
+    },
+    "heroine_traits": {
+        "Sunshine": ["sunshine heroine"],
+        "Grumpy": ["grumpy heroine"],
+        "Strong-willed": ["strong willed", "headstrong", "feisty", "independent woman"],
+        "Morally Grey": ["morally grey heroine", "morally gray heroine", "villainess"],
+        "Bookworm": ["bookworm", "librarian", "librarians", "bookshop", "bookstore"],
+        "STEM Girl": ["scientist", "scientists", "engineer", "physicist", "women scientists", "phd"],
+        "Single Mom": ["single mom", "single mother", "single mothers"],
+        "Princess": ["princess", "princesses"],
+    },
+}
+
+
+class KeywordMatcher:
+    """Phrase -> [(column, label)] table matched against tokenized columns."""
+
+    def __init__(self, rules: Dict[str, Dict[str, Sequence[str]]] = TAG_RULES, min_tokens: int = 1):
+        # Phrases are stored as their space-joined tokens ('enemies to lovers')
+        self.targets: Dict[str, List[Tuple[str, str]]] = {}
+        # length -> tokens seen at each position, used to prune candidates
+        self.position_tokens: Dict[int, List[Set[str]]] = {}
+        for column, labels in rules.items():
+            for label, phrases in labels.items():
+                for phrase in phrases:
+                    tokens = tokenize(phrase)
+                    if len(tokens) < max(min_tokens, 1):
+                        continue
+                    hits = self.targets.setdefault(" ".join(tokens), [])
+                    if (column, label) not in hits:
+                        hits.append((column, label))
+                    positions = self.position_tokens.setdefault(len(tokens), [set() for _ in tokens])
+                    for position, token in zip(positions, tokens):
+                        position.add(token)
+        self.first_tokens = sorted(set().union(*(p[0] for p in self.position_tokens.values())))
+        self.lengths = sorted(self.position_tokens)
+
+    def matches(self, series: pd.Series) -> Iterator[Tuple[int, str, str]]:
+        """Yield (row position, column, label) for every phrase found in `series`."""
+        rows, tokens = tokenize_column(series)
+        n_tokens = len(tokens)
+        if not n_tokens:
+            return
+        starts = np.flatnonzero(pd.Series(tokens, dtype=object).isin(self.first_tokens).to_numpy())
+        # Drop candidates right after a negation in the same cell
+        prev = starts[starts > 0] - 1
+        negated = np.zeros(len(starts), dtype=bool)
+        negated[starts > 0] = (rows[prev] == rows[prev + 1]) & pd.Series(tokens[prev], dtype=object).isin(NEGATIONS).to_numpy()
+        starts = starts[~negated]
+
+        for length in self.lengths:
+            idx = starts[starts + length <= n_tokens]
+            idx = idx[rows[idx + length - 1] == rows[idx]]
+            # Keep only windows whose every token can appear at that position
+            for offset, allowed in enumerate(self.position_tokens[length]):
+                if not len(idx):
+                    break
+                idx = idx[pd.Series(tokens[idx + offset], dtype=object).isin(allowed).to_numpy()]
+            if not len(idx):
+                continue
+            keys = tokens[idx]
+            for offset in range(1, length):
+                keys = keys + " " + tokens[idx + offset]
+            found = pd.Series(keys, dtype=object).isin(self.targets).to_numpy()
+            for row, key in zip(rows[idx[found]].tolist(), keys[found].tolist()):
+                for column, label in self.targets[key]:
+                    yield row, column, label
+
+
+_MATCHERS: Dict[int, KeywordMatcher] = {}
+
+
+def get_matcher(min_tokens: int = 1) -> KeywordMatcher:
+    if min_tokens not in _MATCHERS:
+        _MATCHERS[min_tokens] = KeywordMatcher(min_tokens=min_tokens)
+    return _MATCHERS[min_tokens]
+
+
+def suggest_tags(df: pd.DataFrame, matcher: KeywordMatcher = None) -> pd.DataFrame:
+    """
+    Suggested cell per tag column ('' = nothing found), aligned with df.
+    Facet labels come out in dictionary order, pipe-separated. A given
+    `matcher` is used for every source column as is (no TAG_SOURCES limits).
+    """
+    found: Dict[str, Dict[int, Set[str]]] = defaultdict(lambda: defaultdict(set))
+    for source, min_tokens in TAG_SOURCES.items():
+        if source in df.columns:
+            for row, column, label in (matcher or get_matcher(min_tokens)).matches(df[source]):
+                found[column][row].add(label)
+
+    out = pd.DataFrame("", index=df.index, columns=TAG_COLUMNS, dtype=object)
+    for column in TAG_COLUMNS:
+        if not found.get(column):
+            continue
+        cells = np.full(len(df), "", dtype=object)
+        if column == "spice_level":
+            for row, levels in found[column].items():
+                cells[row] = str(max(int(level) for level in levels))
+        else:
+            order = list(TAG_RULES[column])
+            for row, labels in found[column].items():
+                cells[row] = "|".join(label for label in order if label in labels)
+        out[column] = cells
+    return out
+
+
+def _blank_mask(values: pd.Series) -> np.ndarray:
+    return (values.isna() | (values.astype(str).str.strip() == "")).to_numpy()
+
+
+def tag_frame(df: pd.DataFrame, matcher: KeywordMatcher = None) -> Dict[str, int]:
+    """
+    Fill blank tag cells of `df` in place and list them in auto_tagged;
+    returns cells filled per column.
+    """
+    suggestions = suggest_tags(df, matcher)
+    existing = df[AUTO_TAGGED_COLUMN].tolist() if AUTO_TAGGED_COLUMN in df.columns else [""] * len(df)
+    marks = [[c for c in str(v).split("|") if c] if not _is_blank(v) else [] for v in existing]
+    filled: Dict[str, int] = {}
+    for column in TAG_COLUMNS:
+        if column not in df.columns:
+            df[column] = ""
+        fill = _blank_mask(df[column]) & (suggestions[column].to_numpy() != "")
+        filled[column] = int(fill.sum())
+        if filled[column]:
+            if df[column].dtype != object:
+                df[column] = df[column].astype(object)
+            df.loc[fill, column] = suggestions[column].to_numpy()[fill]
+            for row in np.flatnonzero(fill).tolist():
+                if column not in marks[row]:
+                    marks[row].append(column)
+    df[AUTO_TAGGED_COLUMN] = ["|".join(m) for m in marks]
+    return filled
+
+
+def _is_blank(value) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value)) or str(value).strip() == ""
+
+
+def tag_csv(path: Path, matcher: KeywordMatcher = None) -> Dict[str, int]:
+    """Tag a catalogue CSV in place (atomic replace); other cells stay as-is."""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    filled = tag_frame(df, matcher)
+    if any(filled.values()):
+        with atomic_replace(path) as tmp_path:
+            df.to_csv(tmp_path, index=False, lineterminator="\n")
+    return filled
+
+
+def tag_summary(filled: Dict[str, int]) -> str:
+    return "Tagging: filled " + ", ".join(f"{n} {col}" for col, n in filled.items())
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:] or [str(Path("data") / "romance_catalogue.csv")]:
+        print(f"{arg}: {tag_summary(tag_csv(Path(arg)))}")
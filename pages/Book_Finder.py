@@ -1,7 +1,13 @@
 import streamlit as st
-import pandas as pd
+from dataclasses import asdict
 from pathlib import Path
 
+from catalogue.covers import CoverCache
+from catalogue.engine import CatalogueEngine, Query
+from catalogue.live import LiveCatalogue
+from catalogue.result_cache import ResultCache
+from catalogue.sqlite_store import SqliteCatalogue
+
 st.set_page_config(
     page_title="SizzlClub · Book Finder",
     page_icon="📚",
@@ -65,44 +71,58 @@ st.markdown(
 st.write("")
 
 
-# -------------- LOAD CATALOGUE (ONLY FROM CSV) --------------
-@st.cache_data
-def load_catalogue() -> pd.DataFrame:
+# -------------- LOAD CATALOGUE (CSV, OR THE OPTIONAL SQLITE DB) --------------
+CATALOGUE_PATH = Path("data") / "romance_catalogue.csv"
+CATALOGUE_DB = Path("data") / "romance_catalogue.sqlite"   # optional backend
+FEATURED_COVERS = 4   # books shown as a cover row at the top of each page
+
+
+def build_engine(path: Path, version: str) -> CatalogueEngine:
     """
-    Load the curated romance catalogue from data/romance_catalogue.csv.
+    Load the curated romance catalogue from data/romance_catalogue.csv
+    (via its Parquet copy when that is up to date; descriptions stay in
+    their memory-mapped store) and build its search indexes. The engine is
+    read-only and shared by every session without copying.
     """
-    path = Path("data") / "romance_catalogue.csv"
-    df = pd.read_csv(path)
-    # Normalise string columns to avoid NaN issues
-    for col in df.columns:
-        if df[col].dtype == object:
-            df[col] = df[col].fillna("")
-    return df
+    return CatalogueEngine.from_path(path, version=version)
 
 
-df_catalogue = load_catalogue()
-from collections import Counter
+def build_sqlite_catalogue(path: Path, version: str) -> SqliteCatalogue:
+    """
+    Query data/romance_catalogue.sqlite directly (indexed SQL, nothing
+    loaded up front).
+    """
+    return SqliteCatalogue(path, version=version)
+
 
-def split_pipe_values(series: pd.Series) -> Counter:
+@st.cache_resource
+def load_live_catalogue() -> LiveCatalogue:
     """
-    Takes a column like 'Enemies to Lovers|Slow Burn' and returns
-    a Counter of all individual values across the catalogue.
+    One catalogue per process: the SQLite database when there is one, else
+    the CSV. When the weekly update rewrites the file (or adds the database),
+    a background thread rebuilds it and swaps it in; searches never wait on that.
     """
-    c = Counter()
-    for val in series.dropna():
-        for part in str(val).split("|"):
-            item = part.strip()
-            if item:
-                c[item] += 1
-    return c
-
-# Compute once for the whole catalogue
-RELATIONSHIP_COUNTS = split_pipe_values(
-    df_catalogue["relationship"] if "relationship" in df_catalogue.columns else pd.Series(dtype=str)
-)
-TROPE_COUNTS = split_pipe_values(
-    df_catalogue["tropes"] if "tropes" in df_catalogue.columns else pd.Series(dtype=str)
-)
+    return LiveCatalogue([(CATALOGUE_DB, build_sqlite_catalogue), (CATALOGUE_PATH, build_engine)])
+
+
+@st.cache_resource
+def load_result_cache() -> ResultCache:
+    """Search results shared by all sessions, keyed by query + catalogue version."""
+    return ResultCache()
+
+
+@st.cache_resource
+def load_cover_cache() -> CoverCache:
+    """Local cover thumbnails written by the ingester (assets/covers/)."""
+    return CoverCache()
+
+
+# Taken once per rerun, so the whole page is rendered from one catalogue version
+live_catalogue = load_live_catalogue()
+engine = live_catalogue.current
+result_cache = load_result_cache()
+cover_cache = load_cover_cache()
+cover_cache.refresh()   # new thumbnails from the weekly update, without a restart
 
 
 # -------------- FILTER OPTIONS --------------
@@ -154,10 +174,10 @@ with st.sidebar:
     with st.form("search_form", clear_on_submit=False):
         st.markdown("### 🔎 Search within Sizzl catalogue")
         query = st.text_input(
-            "Title / author / trope (optional)",
+            "Title / author / series / trope / keywords (optional)",
             placeholder="Leave blank to just use filters"
         )
-        max_results = st.slider("Max results", 5, 80, 24, step=4)
+        page_size = st.slider("Results per page", 4, 48, 24, step=4)
 
         st.markdown("---")
         st.markdown("### 🌶 Sizzl filters")
@@ -220,67 +240,24 @@ with st.sidebar:
 
         st.markdown("---")
         search_clicked = st.form_submit_button("Filter Sizzl catalogue")
-        st.markdown("---")
-        st.markdown("### 📊 Sizzl catalogue stats")
-
-        with st.expander("Relationship types in catalogue"):
-            if not RELATIONSHIP_COUNTS:
-                st.caption("No relationship data yet.")
-            else:
-                rel_html = ""
-                for rel, count in RELATIONSHIP_COUNTS.most_common():
-                    rel_html += f'<span class="sizzl-pill">{rel} · {count}</span>'
-                st.markdown(rel_html, unsafe_allow_html=True)
-
-        with st.expander("Tropes in catalogue"):
-            if not TROPE_COUNTS:
-                st.caption("No trope data yet.")
-            else:
-                trope_html = ""
-                for trope, count in TROPE_COUNTS.most_common():
-                    trope_html += f'<span class="sizzl-pill">{trope} · {count}</span>'
-                st.markdown(trope_html, unsafe_allow_html=True)
 
 st.markdown("---")
 
 
 # -------------- FILTER HELPERS --------------
 
-def text_match(df: pd.DataFrame, q: str) -> pd.DataFrame:
-    """Filter by query in title / author / tropes (if query not empty)."""
-    if not q.strip():
-        return df
-    q = q.lower()
-    cols = []
-    for c in ["title", "author", "tropes"]:
-        if c in df.columns:
-            cols.append(df[c].astype(str).str.lower().str.contains(q, na=False))
-    if not cols:
-        return df
-    mask = cols[0]
-    for m in cols[1:]:
-        mask |= m
-    return df[mask]
-
-
-def include_any(df: pd.DataFrame, col: str, selected: list):
-    """Keep rows where 'col' contains ANY of selected values (pipe-separated semantics)."""
-    if not selected or col not in df.columns:
-        return df
-    def row_ok(val: str) -> bool:
-        text = str(val).lower()
-        return any(s.lower() in text for s in selected)
-    return df[df[col].apply(row_ok)]
-
-
-def exclude_any(df: pd.DataFrame, col: str, selected: list):
-    """Drop rows where 'col' contains ANY of selected values."""
-    if not selected or col not in df.columns:
-        return df
-    def row_bad(val: str) -> bool:
-        text = str(val).lower()
-        return any(s.lower() in text for s in selected)
-    return df[~df[col].apply(row_bad)]
+def render_facet_pills(counts, empty_msg: str, label=str) -> None:
+    if not counts:
+        st.caption(empty_msg)
+        return
+    html = ""
+    for value, count in counts.most_common():
+        html += f'<span class="sizzl-pill">{label(value)} · {count}</span>'
+    st.markdown(html, unsafe_allow_html=True)
+
+
+def spice_label(level: int) -> str:
+    return SPICE_LEVELS[level - 1] if 1 <= level <= len(SPICE_LEVELS) else str(level)
 
 
 def spice_string_to_int(s: str) -> int:
@@ -293,127 +270,223 @@ def spice_string_to_int(s: str) -> int:
 
 # -------------- MAIN LOGIC --------------
 
+def render_featured(df) -> None:
+    """Cover row for (up to) the first FEATURED_COVERS books of the page."""
+    featured = df.head(FEATURED_COVERS)
+    cols = st.columns(len(featured))
+
+    for (idx, row), col in zip(featured.iterrows(), cols):
+        with col:
+            cover_url = row.get("cover_url", "")
+            if isinstance(cover_url, str) and cover_url:
+                # Local thumbnail when cached, remote cover otherwise
+                col.image(cover_cache.src(cover_url), width=110)
+            else:
+                col.write("📕 (no cover)")
+
+            title = row.get("title", "Untitled")
+            link = row.get("link", "")
+            author = row.get("author", "Unknown")
+
+            if isinstance(link, str) and link:
+                col.markdown(
+                    f'<div class="sizzl-cover-title"><a href="{link}" target="_blank">{title}</a></div>',
+                    unsafe_allow_html=True
+                )
+            else:
+                col.markdown(
+                    f'<div class="sizzl-cover-title">{title}</div>',
+                    unsafe_allow_html=True
+                )
+            col.caption(author)
+
+
+def render_details(df) -> None:
+    for _, row in df.iterrows():
+        title = row.get("title", "Untitled")
+        author = row.get("author", "Unknown")
+        year = row.get("year", "")
+        series_name = row.get("series_name", "")
+        series_order = row.get("series_order", "")
+        link = row.get("link", "")
+        desc = row.get("description", "")
+
+        meta_bits = [author]
+        if year:
+            meta_bits.append(str(year))
+        if series_name:
+            s = series_name
+            if series_order not in ("", None):
+                s += f" · #{series_order}"
+            meta_bits.append(s)
+        meta_line = " · ".join(meta_bits)
+
+        with st.container():
+            st.markdown('<div class="sizzl-card">', unsafe_allow_html=True)
+            if link:
+                st.markdown(f"**[{title}]({link})**")
+            else:
+                st.markdown(f"**{title}**")
+            st.markdown(
+                f'<span class="sizzl-meta">{meta_line}</span>',
+                unsafe_allow_html=True
+            )
+            if desc:
+                st.write(desc[:400] + ("..." if len(desc) > 400 else ""))
+
+            st.markdown("</div>", unsafe_allow_html=True)
+
+
+def prefetch_covers(cover_urls) -> None:
+    """Warm the browser cache with the next page's remote covers (hidden, zero-size)."""
+    urls = [
+        u for u in cover_urls
+        if isinstance(u, str) and u and u not in cover_cache
+    ]
+    if urls:
+        st.markdown(
+            "".join(f'<img src="{u}" width="0" height="0" style="display:none" alt="">' for u in urls),
+            unsafe_allow_html=True,
+        )
+
+
+def go_to_page(number: int) -> None:
+    st.session_state["results_page"] = number
+
+
+# Sidebar stats show the whole catalogue until a search narrows it down
+facets = engine.facet_counts
+facet_scope = "in catalogue"
+
 if search_clicked:
+    search = Query(
+        text=query,
+        spice_include=tuple(spice_string_to_int(s) for s in spice_inc),
+        spice_exclude=tuple(spice_string_to_int(s) for s in spice_exc),
+        include={
+            "genres": tuple(genre_inc),
+            "relationship": tuple(rel_inc),
+            "tropes": tuple(tropes_inc),
+            "content_warnings": tuple(cw_inc),
+            "hero_traits": tuple(hero_inc),
+            "heroine_traits": tuple(heroine_inc),
+        },
+        exclude={
+            "genres": tuple(genre_exc),
+            "relationship": tuple(rel_exc),
+            "tropes": tuple(tropes_exc),
+            "content_warnings": tuple(cw_exc),
+            "hero_traits": tuple(hero_exc),
+            "heroine_traits": tuple(heroine_exc),
+        },
+    )
+    # Remember the search so paging (which reruns the script) keeps it
+    st.session_state["active_search"] = None if search.is_empty() else search
+    st.session_state["results_page"] = 0
+    st.session_state["page_size"] = page_size
+
     # Check if literally no query AND no filters
-    any_filters = any([
-        spice_inc, spice_exc,
-        genre_inc, genre_exc,
-        rel_inc, rel_exc,
-        tropes_inc, tropes_exc,
-        cw_inc, cw_exc,
-        hero_inc, hero_exc,
-        heroine_inc, heroine_exc,
-    ])
-    if not query.strip() and not any_filters:
+    if search.is_empty():
         st.info("Type a search OR pick at least one filter to browse the Sizzl catalogue.")
+
+active_search = st.session_state.get("active_search")
+
+if active_search is not None:
+    result = result_cache.search(engine, active_search)
+    facets = result.facets
+    facet_scope = "in these results"
+
+    if result.total == 0:
+        st.warning("No books match this combination yet. Try relaxing a filter or two.")
     else:
-        df = df_catalogue.copy()
-
-        # Query filter
-        df = text_match(df, query)
-
-        # Spice filters assume a numeric 'spice_level' column in your CSV
-        if "spice_level" in df.columns:
-            if spice_inc:
-                nums = [spice_string_to_int(s) for s in spice_inc]
-                df = df[df["spice_level"].isin(nums)]
-            if spice_exc:
-                nums = [spice_string_to_int(s) for s in spice_exc]
-                df = df[~df["spice_level"].isin(nums)]
-
-        # Other filters based on pipe-separated fields
-        df = include_any(df, "genres", genre_inc)
-        df = exclude_any(df, "genres", genre_exc)
-
-        df = include_any(df, "relationship", rel_inc)
-        df = exclude_any(df, "relationship", rel_exc)
-
-        df = include_any(df, "tropes", tropes_inc)
-        df = exclude_any(df, "tropes", tropes_exc)
-
-        df = include_any(df, "content_warnings", cw_inc)
-        df = exclude_any(df, "content_warnings", cw_exc)
-
-        df = include_any(df, "hero_traits", hero_inc)
-        df = exclude_any(df, "hero_traits", hero_exc)
-
-        df = include_any(df, "heroine_traits", heroine_inc)
-        df = exclude_any(df, "heroine_traits", heroine_exc)
-
-        # Limit rows
-        df = df.head(max_results)
-
-        if df.empty:
-            st.warning("No books match this combination yet. Try relaxing a filter or two.")
-        else:
-            st.markdown(f"#### Showing {len(df)} book(s) from the Sizzl catalogue")
-
-            # Featured row: first up to 4
-            featured = df.head(4)
-            cols = st.columns(len(featured))
-
-            for (idx, row), col in zip(featured.iterrows(), cols):
-                with col:
-                    cover_url = row.get("cover_url", "")
-                    if isinstance(cover_url, str) and cover_url:
-                        col.image(cover_url, use_column_width=False, width=110)
-                    else:
-                        col.write("📕 (no cover)")
-
-                    title = row.get("title", "Untitled")
-                    link = row.get("link", "")
-                    author = row.get("author", "Unknown")
-
-                    if isinstance(link, str) and link:
-                        col.markdown(
-                            f'<div class="sizzl-cover-title"><a href="{link}" target="_blank">{title}</a></div>',
-                            unsafe_allow_html=True
-                        )
-                    else:
-                        col.markdown(
-                            f'<div class="sizzl-cover-title">{title}</div>',
-                            unsafe_allow_html=True
-                        )
-                    col.caption(author)
-
-            st.markdown("---")
-            st.markdown("### More details")
-
-            # List view (skip the ones already shown in featured)
-            remaining = df.iloc[4:]
-            for _, row in remaining.iterrows():
-                title = row.get("title", "Untitled")
-                author = row.get("author", "Unknown")
-                year = row.get("year", "")
-                series_name = row.get("series_name", "")
-                series_order = row.get("series_order", "")
-                link = row.get("link", "")
-                desc = row.get("description", "")
-
-                meta_bits = [author]
-                if year:
-                    meta_bits.append(str(year))
-                if series_name:
-                    s = series_name
-                    if series_order not in ("", None):
-                        s += f" · #{series_order}"
-                    meta_bits.append(s)
-                meta_line = " · ".join(meta_bits)
-
-                with st.container():
-                    st.markdown('<div class="sizzl-card">', unsafe_allow_html=True)
-                    if link:
-                        st.markdown(f"**[{title}]({link})**")
-                    else:
-                        st.markdown(f"**{title}**")
-                    st.markdown(
-                        f'<span class="sizzl-meta">{meta_line}</span>',
-                        unsafe_allow_html=True
-                    )
-                    if desc:
-                        st.write(desc[:400] + ("..." if len(desc) > 400 else ""))
-
-                    st.markdown("</div>", unsafe_allow_html=True)
-
-else:
+        size = st.session_state.get("page_size", page_size)
+        n_pages = result.page_count(size)
+        page_no = min(st.session_state.get("results_page", 0), n_pages - 1)
+
+        # Only this page is materialised into a DataFrame / widgets
+        df = engine.rows(result.page(page_no, size))
+        first = page_no * size + 1
+
+        if result.is_fuzzy:
+            names = ", ".join(f"“{m.label}”" for m in result.fuzzy_matches[:3])
+            st.caption(f"No exact matches for “{active_search.text.strip()}” — showing close matches: {names}")
+        st.markdown(
+            f"#### Found {result.total} book(s) in the Sizzl catalogue · "
+            f"showing {first}–{first + len(df) - 1}"
+        )
+
+        render_featured(df)
+
+        st.markdown("---")
+        st.markdown("### More details")
+
+        # List view (skip the ones already shown in featured)
+        render_details(df.iloc[FEATURED_COVERS:])
+
+        if n_pages > 1:
+            col_prev, col_info, col_next = st.columns([1, 2, 1])
+            with col_prev:
+                st.button(
+                    "← Previous", disabled=page_no == 0,
+                    on_click=go_to_page, args=(page_no - 1,),
+                )
+            with col_info:
+                st.caption(f"Page {page_no + 1} of {n_pages}")
+            with col_next:
+                st.button(
+                    "Next →", disabled=page_no >= n_pages - 1,
+                    on_click=go_to_page, args=(page_no + 1,),
+                )
+            if page_no < n_pages - 1:
+                # Only the next page's cover row is shown as images
+                prefetch_covers(engine.cover_urls(result.page(page_no + 1, size)[:FEATURED_COVERS]))
+
+elif not search_clicked:
     st.info("Use the sidebar to search or just pick filters — you don’t have to type anything if you already know your vibes.")
+
+
+# -------------- CATALOGUE STATS (LIVE FACET COUNTS) --------------
+FACET_SECTIONS = [
+    ("spice_level", "Spice levels", "No spice data yet."),
+    ("genres", "Genres", "No genre data yet."),
+    ("relationship", "Relationship types", "No relationship data yet."),
+    ("tropes", "Tropes", "No trope data yet."),
+    ("content_warnings", "Content warnings", "No content warning data yet."),
+    ("hero_traits", "Hero traits", "No hero trait data yet."),
+    ("heroine_traits", "Heroine traits", "No heroine trait data yet."),
+]
+
+with st.sidebar:
+    st.markdown("---")
+    st.markdown("### 📊 Sizzl catalogue stats")
+    for col, title, empty_msg in FACET_SECTIONS:
+        with st.expander(f"{title} {facet_scope}"):
+            label = spice_label if col == "spice_level" else str
+            render_facet_pills(facets.get(col), empty_msg, label)
+
+
+# -------------- DEBUG PANEL (?debug=1) --------------
+if st.query_params.get("debug") == "1":
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### 🛠 Debug")
+        st.caption("**Result cache**")
+        st.json(result_cache.stats())
+        st.caption("**Catalogue**")
+        st.json({
+            "version": engine.version,
+            "rows": len(engine),
+            "backend": type(engine).__name__,
+            "reloads": live_catalogue.reloads,
+            "last reload error": live_catalogue.last_error,
+        })
+        if active_search is not None:
+            # Cache hits show the plan recorded when the entry was computed
+            st.caption("**Query plan** (most selective filter first)")
+            if result.plan:
+                st.dataframe([asdict(step) for step in result.plan], hide_index=True)
+            else:
+                st.caption("n/a for this backend")
+
+# Persist cover last-used times now and then (LRU order for a trim without a catalogue)
+cover_cache.flush()